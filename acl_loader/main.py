@@ -3,8 +3,10 @@
 import click
 import ipaddr
 import json
+import multiprocessing
 import syslog
 import tabulate
+from collections import namedtuple
 from natsort import natsorted
 
 import openconfig_acl
@@ -67,6 +69,33 @@ class AclLoaderException(Exception):
     pass
 
 
+# Keys of the ACL rules to add, modify and delete to reach a rule set
+AclRulesDiff = namedtuple("AclRulesDiff", ["added", "modified", "removed"])
+
+
+def plain_value(value):
+    """
+    Convert a rule property value, which may be a pyangbind type, to a
+    plain python value that can be pickled
+    """
+    if isinstance(value, (int, long)):
+        return int(value)
+    if isinstance(value, list):
+        return [plain_value(item) for item in value]
+    return str(value)
+
+
+# AclLoader converting rules in the worker processes of convert_rules(),
+# inherited from the parent when the workers are forked
+_converting_loader = None
+
+
+def _convert_table_rules(acl_set_name):
+    rules = _converting_loader.convert_table_rules(acl_set_name)
+    return dict((key, dict((prop, plain_value(value)) for prop, value in props.iteritems()))
+                for key, props in rules.iteritems())
+
+
 class AclLoader(object):
 
     ACL_TABLE = "ACL_TABLE"
@@ -115,6 +144,11 @@ class AclLoader(object):
         self.rules_db_info = {}
         self.rules_info = {}
         self.sessions_db_info = {}
+        self.switch_capability = None
+        self.session_name = None
+        self.supported_actions = {}
+        self.ip_versions = {}
+        self.ports = {}
         self.configdb = ConfigDBConnector()
         self.configdb.connect()
         self.statedb = SonicV2Connector(host="127.0.0.1")
@@ -183,11 +217,13 @@ class AclLoader(object):
         if self.requested_session:
             return self.requested_session
 
-        for key in self.get_sessions_db_info():
-            if key.startswith(self.SESSION_PREFIX):
-                return key
+        if self.session_name is None:
+            for key in self.get_sessions_db_info():
+                if key.startswith(self.SESSION_PREFIX):
+                    self.session_name = key
+                    break
 
-        return None
+        return self.session_name
 
     def set_table_name(self, table_name):
         """
@@ -254,15 +290,16 @@ class AclLoader(object):
                 raise AclLoaderException("Invalid input file %s" % filename)
         return yang_acl
 
-    def load_rules_from_file(self, filename):
+    def load_rules_from_file(self, filename, jobs=1):
         """
         Load file with ACL rules configuration in openconfig ACL format. Convert rules
         to Config DB schema.
         :param filename: File in openconfig ACL format
+        :param jobs: Number of processes converting the ACL sets in parallel
         :return:
         """
         self.yang_acl = AclLoader.parse_acl_json(filename)
-        self.convert_rules()
+        self.convert_rules(jobs)
 
     def convert_action(self, table_name, rule_idx, rule):
         rule_props = {}
@@ -299,6 +336,16 @@ class AclLoader(object):
 
         return rule_props
 
+    def get_switch_capability(self):
+        """
+        Get the switch capabilities from state database, read once
+        :return: SWITCH_CAPABILITY table entry
+        """
+        if self.switch_capability is None:
+            self.switch_capability = self.statedb.get_all(self.statedb.STATE_DB,
+                                                          "{}|switch".format(self.SWITCH_CAPABILITY_TABLE)) or {}
+        return self.switch_capability
+
     def validate_actions(self, table_name, action_props):
         if self.is_table_control_plane(table_name):
             return True
@@ -308,8 +355,30 @@ class AclLoader(object):
         if table_name not in self.tables_db_info:
             raise AclLoaderException("Table {} does not exist".format(table_name))
 
+        # Rules mostly share a few actions, so check each set of actions
+        # of a table once
+        cache_key = (table_name, frozenset(action_props.iteritems()))
+        supported = self.supported_actions.get(cache_key)
+        if supported is None:
+            supported = dict(action_props)
+            self.filter_supported_actions(table_name, supported)
+            self.supported_actions[cache_key] = supported
+
+        for action_key in dict(action_props):
+            if action_key not in supported:
+                del action_props[action_key]
+
+        return action_count == len(action_props)
+
+    def filter_supported_actions(self, table_name, action_props):
+        """
+        Remove the actions the switch does not support in the table stage
+        :param table_name: ACL table name
+        :param action_props: dict of action to value, modified in place
+        :return:
+        """
         stage = self.tables_db_info[table_name].get("stage", Stage.INGRESS)
-        capability = self.statedb.get_all(self.statedb.STATE_DB, "{}|switch".format(self.SWITCH_CAPABILITY_TABLE))
+        capability = self.get_switch_capability()
         for action_key in dict(action_props):
             key = "{}|{}".format(self.ACL_ACTIONS_CAPABILITY_FIELD, stage.upper())
             if key not in capability:
@@ -333,8 +402,6 @@ class AclLoader(object):
                     del action_props[action_key]
                     continue
 
-        return action_count == len(action_props)
-
     def convert_l2(self, table_name, rule_idx, rule):
         rule_props = {}
 
@@ -367,14 +434,14 @@ class AclLoader(object):
 
         if rule.ip.config.source_ip_address:
             source_ip_address = rule.ip.config.source_ip_address.encode("ascii")
-            if ipaddr.IPNetwork(source_ip_address).version == 4:
+            if self.ip_version(source_ip_address) == 4:
                 rule_props["SRC_IP"] = source_ip_address
             else:
                 rule_props["SRC_IPV6"] = source_ip_address
 
         if rule.ip.config.destination_ip_address:
             destination_ip_address = rule.ip.config.destination_ip_address.encode("ascii")
-            if ipaddr.IPNetwork(destination_ip_address).version == 4:
+            if self.ip_version(destination_ip_address) == 4:
                 rule_props["DST_IP"] = destination_ip_address
             else:
                 rule_props["DST_IPV6"] = destination_ip_address
@@ -386,6 +453,17 @@ class AclLoader(object):
 
         return rule_props
 
+    def ip_version(self, address):
+        """
+        Get the IP version of an address or prefix, parsing each distinct value once
+        :param address: String, IP address or prefix
+        :return: 4 or 6
+        """
+        version = self.ip_versions.get(address)
+        if version is None:
+            version = self.ip_versions[address] = ipaddr.IPNetwork(address).version
+        return version
+
     def convert_port(self, port):
         """
         Convert port field format from openconfig ACL to Config DB schema
@@ -394,12 +472,16 @@ class AclLoader(object):
             second value is boolean, True if value is a port range, False
             if it is a single port value
         """
-        # OpenConfig port range is of the format "####..####", whereas
-        # Config DB format is "####-####"
-        if ".." in port:
-            return  port.replace("..", "-"), True
-        else:
-            return port, False
+        converted = self.ports.get(port)
+        if converted is None:
+            # OpenConfig port range is of the format "####..####", whereas
+            # Config DB format is "####-####"
+            if ".." in port:
+                converted = port.replace("..", "-"), True
+            else:
+                converted = port, False
+            self.ports[port] = converted
+        return converted
 
     def convert_transport(self, table_name, rule_idx, rule):
         rule_props = {}
@@ -478,14 +560,47 @@ class AclLoader(object):
         rule_props["PACKET_ACTION"] = "DROP"
         return rule_data
 
-    def convert_rules(self):
+    @staticmethod
+    def acl_set_table_name(acl_set_name):
+        """
+        Get the ACL table name of an openconfig ACL set
+        """
+        return acl_set_name.replace(" ", "_").replace("-", "_").upper().encode('ascii')
+
+    def convert_table_rules(self, acl_set_name):
+        """
+        Convert the rules of one ACL set in openconfig ACL format to Config DB schema
+        :param acl_set_name: openconfig ACL set name
+        :return: dict with Config DB schema
+        """
+        table_name = self.acl_set_table_name(acl_set_name)
+        acl_set = self.yang_acl.acl.acl_sets.acl_set[acl_set_name]
+        rules_info = {}
+
+        for acl_entry_name in acl_set.acl_entries.acl_entry:
+            acl_entry = acl_set.acl_entries.acl_entry[acl_entry_name]
+            try:
+                rule = self.convert_rule_to_db_schema(table_name, acl_entry)
+                deep_update(rules_info, rule)
+            except AclLoaderException as ex:
+                error("Error processing rule %s: %s. Skipped." % (acl_entry_name, ex))
+
+        if not self.is_table_mirror(table_name):
+            deep_update(rules_info, self.deny_rule(table_name))
+
+        return rules_info
+
+    def convert_rules(self, jobs=1):
         """
         Convert rules in openconfig ACL format to Config DB schema
+        :param jobs: Number of processes converting the ACL sets in parallel
         :return:
         """
+        global _converting_loader
+
+        acl_set_names = []
         for acl_set_name in self.yang_acl.acl.acl_sets.acl_set:
-            table_name = acl_set_name.replace(" ", "_").replace("-", "_").upper().encode('ascii')
-            acl_set = self.yang_acl.acl.acl_sets.acl_set[acl_set_name]
+            table_name = self.acl_set_table_name(acl_set_name)
 
             if not self.is_table_valid(table_name):
                 warning("%s table does not exist" % (table_name))
@@ -494,87 +609,151 @@ class AclLoader(object):
             if self.current_table is not None and self.current_table != table_name:
                 continue
 
-            for acl_entry_name in acl_set.acl_entries.acl_entry:
-                acl_entry = acl_set.acl_entries.acl_entry[acl_entry_name]
-                try:
-                    rule = self.convert_rule_to_db_schema(table_name, acl_entry)
-                    deep_update(self.rules_info, rule)
-                except AclLoaderException as ex:
-                    error("Error processing rule %s: %s. Skipped." % (acl_entry_name, ex))
+            acl_set_names.append(acl_set_name)
+
+        if jobs > 1 and len(acl_set_names) > 1:
+            # Read everything the conversion looks up in the databases
+            # before forking, so the workers do not share the connections
+            self.get_switch_capability()
+            self.get_session_name()
+            _converting_loader = self
+            pool = multiprocessing.Pool(min(jobs, len(acl_set_names)))
+            try:
+                tables_rules = pool.map(_convert_table_rules, acl_set_names)
+            finally:
+                pool.terminate()
+                _converting_loader = None
+        else:
+            tables_rules = [self.convert_table_rules(acl_set_name) for acl_set_name in acl_set_names]
 
-            if not self.is_table_mirror(table_name):
-                deep_update(self.rules_info, self.deny_rule(table_name))
+        for rules_info in tables_rules:
+            deep_update(self.rules_info, rules_info)
 
-    def full_update(self):
+    def rule_db_key(self, key):
         """
-        Perform full update of ACL rules configuration. All existing rules
-        will be removed. New rules loaded from file will be installed. If
-        the current_table is not empty, only rules within that table will
-        be removed and new rules in that table will be installed.
-        :return:
+        Get the Config DB key of an ACL rule
+        :param key: Tuple of ACL table name and rule name
+        :return: Config DB key string
+        """
+        return "{}{}{}".format(self.ACL_RULE, self.configdb.TABLE_NAME_SEPARATOR, self.configdb.serialize_key(key))
+
+    def diff_rules(self):
+        """
+        Compare the rules loaded from file with the rules in Config DB. If the
+        current_table is not empty, only rules within that table are compared.
+        Rules are compared in their Config DB form, so a rule is modified only
+        if one of its stored fields changes.
+        :return: AclRulesDiff with the sorted keys of the rules to add, modify and delete
         """
-        for key in self.rules_db_info.keys():
-            if self.current_table is None or self.current_table == key[0]:
-               self.configdb.mod_entry(self.ACL_RULE, key, None)
+        to_raw = self.configdb.typed_to_raw
+        current_rules = dict((key, val) for key, val in self.rules_db_info.iteritems()
+                             if self.current_table is None or self.current_table == key[0])
+
+        added = [key for key in self.rules_info if key not in current_rules]
+        removed = [key for key in current_rules if key not in self.rules_info]
+        modified = [key for key in self.rules_info
+                    if key in current_rules and to_raw(self.rules_info[key]) != to_raw(current_rules[key])]
 
-        self.configdb.mod_config({self.ACL_RULE: self.rules_info})
+        return AclRulesDiff(natsorted(added), natsorted(modified), natsorted(removed))
 
-    def incremental_update(self):
+    def apply_rules_diff(self, diff):
         """
-        Perform incremental ACL rules configuration update. Get existing rules from
-        Config DB. Compare with rules specified in file and perform corresponding
-        modifications.
+        Write ACL rule changes to Config DB in one MULTI/EXEC transaction, so
+        that the new rule set is installed at once and never partly.
+        :param diff: AclRulesDiff to apply
         :return:
         """
+        if not any(diff):
+            return
 
-        # TODO: Until we test ASIC behavior, we cannot assume that we can insert
-        # dataplane ACLs and shift existing ACLs. Therefore, we perform a full
-        # update on dataplane ACLs, and only perform an incremental update on
-        # control plane ACLs.
+        to_raw = self.configdb.typed_to_raw
+        client = self.configdb.get_redis_client(self.configdb.CONFIG_DB)
+        pipe = client.pipeline(transaction=True)
 
-        new_rules = set(self.rules_info.iterkeys())
-        new_dataplane_rules = set()
-        new_controlplane_rules = set()
-        current_rules = set(self.rules_db_info.iterkeys())
-        current_dataplane_rules = set()
-        current_controlplane_rules = set()
+        for key in diff.removed:
+            pipe.delete(self.rule_db_key(key))
 
-        for key in new_rules:
-            table_name = key[0]
-            if self.tables_db_info[table_name]['type'].upper() == self.ACL_TABLE_TYPE_CTRLPLANE:
-                new_controlplane_rules.add(key)
-            else:
-                new_dataplane_rules.add(key)
+        for key in diff.modified:
+            new_raw = to_raw(self.rules_info[key])
+            stale_fields = [field for field in to_raw(self.rules_db_info[key]) if field not in new_raw]
+            if stale_fields:
+                pipe.hdel(self.rule_db_key(key), *stale_fields)
+            pipe.hmset(self.rule_db_key(key), new_raw)
 
-        for key in current_rules:
-            table_name = key[0]
-            if self.tables_db_info[table_name]['type'].upper() == self.ACL_TABLE_TYPE_CTRLPLANE:
-                current_controlplane_rules.add(key)
-            else:
-                current_dataplane_rules.add(key)
+        for key in diff.added:
+            pipe.hmset(self.rule_db_key(key), to_raw(self.rules_info[key]))
 
-        # Remove all existing dataplane rules
-        for key in current_dataplane_rules:
-            self.configdb.mod_entry(self.ACL_RULE, key, None)
+        pipe.execute()
 
-        # Add all new dataplane rules
-        for key in new_dataplane_rules:
-            self.configdb.mod_entry(self.ACL_RULE, key, self.rules_info[key])
+        for key in diff.removed:
+            self.rules_db_info.pop(key, None)
+        for key in diff.modified + diff.added:
+            self.rules_db_info[key] = self.rules_info[key]
 
-        added_controlplane_rules = new_controlplane_rules.difference(current_controlplane_rules)
-        removed_controlplane_rules = current_controlplane_rules.difference(new_controlplane_rules)
-        existing_controlplane_rules = new_rules.intersection(current_controlplane_rules)
+    def show_rules_diff(self, diff):
+        """
+        Show the ACL rule changes planned by an update, without applying them.
+        :param diff: AclRulesDiff to show
+        :return:
+        """
+        header = ("Table", "Rule", "Change", "Fields")
+        to_raw = self.configdb.typed_to_raw
 
-        for key in added_controlplane_rules:
-            self.configdb.mod_entry(self.ACL_RULE, key, self.rules_info[key])
+        data = []
+        for key in diff.added:
+            data.append([key[0], key[1], "add", ""])
+        for key in diff.modified:
+            new_raw = to_raw(self.rules_info[key])
+            old_raw = to_raw(self.rules_db_info[key])
+            fields = [field for field in natsorted(set(new_raw) | set(old_raw)) if new_raw.get(field) != old_raw.get(field)]
+            data.append([key[0], key[1], "modify", ",".join(fields)])
+        for key in diff.removed:
+            data.append([key[0], key[1], "delete", ""])
+
+        print(tabulate.tabulate(natsorted(data), headers=header, tablefmt="simple", missingval=""))
+        info("%d rules to add, %d to modify, %d to delete" % (len(diff.added), len(diff.modified), len(diff.removed)))
+
+    def update_rules(self, dry_run=False):
+        """
+        Bring the ACL rules in Config DB in line with the loaded rules,
+        writing only the rules that differ.
+        :param dry_run: Only show the planned changes
+        :return:
+        """
+        diff = self.diff_rules()
+        if dry_run:
+            self.show_rules_diff(diff)
+        else:
+            self.apply_rules_diff(diff)
 
-        for key in removed_controlplane_rules:
-            self.configdb.mod_entry(self.ACL_RULE, key, None)
+    def full_update(self, dry_run=False):
+        """
+        Perform full update of ACL rules configuration. All existing rules
+        will be removed. New rules loaded from file will be installed. If
+        the current_table is not empty, only rules within that table will
+        be removed and new rules in that table will be installed.
+        Rules which are the same in the file and in Config DB are left as is,
+        and all changes are applied in one transaction.
+        :param dry_run: Only show the planned changes
+        :return:
+        """
+        self.update_rules(dry_run)
 
-        for key in existing_controlplane_rules:
-            if cmp(self.rules_info[key], self.rules_db_info[key]) != 0:
-                self.configdb.set_entry(self.ACL_RULE, key, self.rules_info[key])
+    def incremental_update(self, dry_run=False):
+        """
+        Perform incremental ACL rules configuration update. Get existing rules from
+        Config DB. Compare with rules specified in file and perform corresponding
+        modifications.
+        :param dry_run: Only show the planned changes
+        :return:
+        """
 
+        # Dataplane rules used to be removed and re-added in full, because we
+        # cannot assume that dataplane ACLs can be inserted by shifting existing
+        # ones in the ASIC. Now only the changed rules are written, for both
+        # dataplane and control plane ACLs, and all the changes are applied in
+        # one Config DB transaction.
+        self.update_rules(dry_run)
 
     def delete(self, table=None, rule=None):
         """
@@ -582,10 +761,9 @@ class AclLoader(object):
         :param rule:
         :return:
         """
-        for key in self.rules_db_info.iterkeys():
-            if not table or table == key[0]:
-                if not rule or rule == key[1]:
-                    self.configdb.set_entry(self.ACL_RULE, key, None)
+        removed = [key for key in self.rules_db_info.iterkeys()
+                   if (not table or table == key[0]) and (not rule or rule == key[1])]
+        self.apply_rules_diff(AclRulesDiff([], [], natsorted(removed)))
 
 
     def show_table(self, table_name):
@@ -819,8 +997,10 @@ def update(ctx):
 @click.option('--session_name', type=click.STRING, required=False)
 @click.option('--mirror_stage', type=click.Choice(["ingress", "egress"]), default="ingress")
 @click.option('--max_priority', type=click.INT, required=False)
+@click.option('--dry_run', is_flag=True, help="Show the rule changes without applying them")
+@click.option('--jobs', type=click.IntRange(1), default=1, help="Number of processes converting the ACL tables in parallel")
 @click.pass_context
-def full(ctx, filename, table_name, session_name, mirror_stage, max_priority):
+def full(ctx, filename, table_name, session_name, mirror_stage, max_priority, dry_run, jobs):
     """
     Full update of ACL rules configuration.
     If a table_name is provided, the operation will be restricted in the specified table.
@@ -838,8 +1018,8 @@ def full(ctx, filename, table_name, session_name, mirror_stage, max_priority):
     if max_priority:
         acl_loader.set_max_priority(max_priority)
 
-    acl_loader.load_rules_from_file(filename)
-    acl_loader.full_update()
+    acl_loader.load_rules_from_file(filename, jobs)
+    acl_loader.full_update(dry_run)
 
 
 @update.command()
@@ -847,8 +1027,10 @@ def full(ctx, filename, table_name, session_name, mirror_stage, max_priority):
 @click.option('--session_name', type=click.STRING, required=False)
 @click.option('--mirror_stage', type=click.Choice(["ingress", "egress"]), default="ingress")
 @click.option('--max_priority', type=click.INT, required=False)
+@click.option('--dry_run', is_flag=True, help="Show the rule changes without applying them")
+@click.option('--jobs', type=click.IntRange(1), default=1, help="Number of processes converting the ACL tables in parallel")
 @click.pass_context
-def incremental(ctx, filename, session_name, mirror_stage, max_priority):
+def incremental(ctx, filename, session_name, mirror_stage, max_priority, dry_run, jobs):
     """
     Incremental update of ACL rule configuration.
     """
@@ -862,8 +1044,8 @@ def incremental(ctx, filename, session_name, mirror_stage, max_priority):
     if max_priority:
         acl_loader.set_max_priority(max_priority)
 
-    acl_loader.load_rules_from_file(filename)
-    acl_loader.incremental_update()
+    acl_loader.load_rules_from_file(filename, jobs)
+    acl_loader.incremental_update(dry_run)
 
 
 @cli.command()
@@ -4,21 +4,27 @@ import sys
 import os
 import click
 import json
+import shlex
 import subprocess
 import netaddr
 import re
 import syslog
 import time
 import netifaces
+from contextlib import contextmanager
 
 import sonic_device_util
 import ipaddress
 from swsssdk import ConfigDBConnector
 from swsssdk import SonicV2Connector
 from minigraph import parse_device_desc_xml
+from tabulate import tabulate
 
 import aaa
 import mlnx
+from utilities_common.bulkdb import BatchConfigDB
+from utilities_common.intf_alias import get_alias_converter
+from utilities_common.script_runner import load_script
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help', '-?'])
 
@@ -82,78 +88,50 @@ def run_command(command, display_cmd=False, ignore_error=False):
         sys.exit(proc.returncode)
 
 
+def get_port_alias_converter():
+    """Return the interface alias converter, aborting if the PORT table is empty
+    """
+    converter = get_alias_converter()
+    if not converter.port_dict:
+        click.echo("port_dict is None!")
+        raise click.Abort()
+    return converter
+
+
 def interface_alias_to_name(interface_alias):
     """Return default interface name if alias name is given as argument
     """
-    config_db = ConfigDBConnector()
-    config_db.connect()
-    port_dict = config_db.get_table('PORT')
-
-    vlan_id = ""
-    sub_intf_sep_idx = -1
-    if interface_alias is not None:
-        sub_intf_sep_idx = interface_alias.find(VLAN_SUB_INTERFACE_SEPARATOR)
-        if sub_intf_sep_idx != -1:
-            vlan_id = interface_alias[sub_intf_sep_idx + 1:]
-            # interface_alias holds the parent port name so the subsequent logic still applies
-            interface_alias = interface_alias[:sub_intf_sep_idx]
-
-    if interface_alias is not None:
-        if not port_dict:
-            click.echo("port_dict is None!")
-            raise click.Abort()
-        for port_name in port_dict.keys():
-            if interface_alias == port_dict[port_name]['alias']:
-                return port_name if sub_intf_sep_idx == -1 else port_name + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+    if interface_alias is None:
+        return None
 
-    # Interface alias not in port_dict, just return interface_alias, e.g.,
+    # Interface alias not in PORT table is returned as is, e.g.,
     # portchannel is passed in as argument, which does not have an alias
-    return interface_alias if sub_intf_sep_idx == -1 else interface_alias + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
+    return get_port_alias_converter().alias_to_name(interface_alias)
 
 
 def interface_name_is_valid(interface_name):
     """Check if the interface name is valid
     """
-    config_db = ConfigDBConnector()
-    config_db.connect()
-    port_dict = config_db.get_table('PORT')
-    port_channel_dict = config_db.get_table('PORTCHANNEL')
-    sub_port_intf_dict = config_db.get_table('VLAN_SUB_INTERFACE')
-
     if get_interface_naming_mode() == "alias":
         interface_name = interface_alias_to_name(interface_name)
 
     if interface_name is not None:
-        if not port_dict:
-            click.echo("port_dict is None!")
-            raise click.Abort()
-        for port_name in port_dict.keys():
-            if interface_name == port_name:
-                return True
-        if port_channel_dict:
-            for port_channel_name in port_channel_dict.keys():
-                if interface_name == port_channel_name:
-                    return True
-        if sub_port_intf_dict:
-            for sub_port_intf_name in sub_port_intf_dict.keys():
-                if interface_name == sub_port_intf_name:
-                    return True
+        if get_port_alias_converter().is_port(interface_name):
+            return True
+
+        config_db = ConfigDBConnector()
+        config_db.connect()
+        if interface_name in config_db.get_keys('PORTCHANNEL'):
+            return True
+        if interface_name in config_db.get_keys('VLAN_SUB_INTERFACE'):
+            return True
     return False
 
 def interface_name_to_alias(interface_name):
     """Return alias interface name if default name is given as argument
     """
-    config_db = ConfigDBConnector()
-    config_db.connect()
-    port_dict = config_db.get_table('PORT')
-
     if interface_name is not None:
-        if not port_dict:
-            click.echo("port_dict is None!")
-            raise click.Abort()
-        for port_name in port_dict.keys():
-            if interface_name == port_name:
-                return port_dict[port_name]['alias']
+        return get_port_alias_converter().get_alias(interface_name)
 
     return None
 
@@ -396,77 +374,157 @@ def _abort_if_false(ctx, param, value):
     if not value:
         ctx.abort()
 
-def _stop_services():
-    # on Mellanox platform pmon is stopped by syncd
-    services_to_stop = [
-        'swss',
-        'lldp',
-        'pmon',
-        'bgp',
-        'hostcfgd',
-    ]
-    if asic_type == 'mellanox' and 'pmon' in services_to_stop:
-        services_to_stop.remove('pmon')
-
-    for service in services_to_stop:
-        try:
-            click.echo("Stopping service {} ...".format(service))
-            run_command("systemctl stop {}".format(service))
+# Services stopped before and restarted after a config push. The services
+# of a wave are passed to a single systemctl call, so systemd runs their
+# jobs in parallel; a wave only starts once the previous one is done.
+SERVICES_STOP_WAVES = [
+    ['swss'],
+    ['lldp', 'pmon', 'bgp', 'hostcfgd'],
+]
+
+SERVICES_TO_RESET = [
+    'bgp',
+    'dhcp_relay',
+    'hostcfgd',
+    'hostname-config',
+    'interfaces-config',
+    'lldp',
+    'ntp-config',
+    'pmon',
+    'radv',
+    'rsyslog-config',
+    'snmp',
+    'swss',
+    'syncd',
+    'teamd'
+]
+
+SERVICES_RESTART_WAVES = [
+    ['hostname-config', 'interfaces-config', 'rsyslog-config'],
+    # ntp.conf listens on the eth0 address set up by interfaces-config
+    ['ntp-config'],
+    ['swss'],
+    ['bgp', 'pmon', 'lldp', 'hostcfgd', 'sflow'],
+]
+
+def _run_systemctl(action, services, message, error):
+    """Run 'systemctl <action>' on several services at once
+    """
+    service_list = ' '.join(services)
+    try:
+        click.echo("{} {} ...".format(message, service_list))
+        run_command("systemctl {} {}".format(action, service_list))
+    except SystemExit as e:
+        log_error("{} {} failed with error {}".format(error, service_list, e))
+        raise
 
-        except SystemExit as e:
-            log_error("Stopping {} failed with error {}".format(service, e))
-            raise
+def _stop_services():
+    for services in SERVICES_STOP_WAVES:
+        # on Mellanox platform pmon is stopped by syncd
+        if asic_type == 'mellanox':
+            services = [service for service in services if service != 'pmon']
+        _run_systemctl('stop', services, "Stopping services", "Stopping")
 
 def _reset_failed_services():
-    services_to_reset = [
-        'bgp',
-        'dhcp_relay',
-        'hostcfgd',
-        'hostname-config',
-        'interfaces-config',
-        'lldp',
-        'ntp-config',
-        'pmon',
-        'radv',
-        'rsyslog-config',
-        'snmp',
-        'swss',
-        'syncd',
-        'teamd'
-    ]
-
-    for service in services_to_reset:
-        try:
-            click.echo("Resetting failed status for service {} ...".format(service))
-            run_command("systemctl reset-failed {}".format(service))
-        except SystemExit as e:
-            log_error("Failed to reset failed status for service {}".format(service))
-            raise
+    _run_systemctl('reset-failed', SERVICES_TO_RESET,
+                   "Resetting failed status for services", "Resetting failed status for")
 
 def _restart_services():
-    # on Mellanox platform pmon is started by syncd
-    services_to_restart = [
-        'hostname-config',
-        'interfaces-config',
-        'ntp-config',
-        'rsyslog-config',
-        'swss',
-        'bgp',
-        'pmon',
-        'lldp',
-        'hostcfgd',
-        'sflow',
-    ]
-    if asic_type == 'mellanox' and 'pmon' in services_to_restart:
-        services_to_restart.remove('pmon')
-
-    for service in services_to_restart:
-        try:
-            click.echo("Restarting service {} ...".format(service))
-            run_command("systemctl restart {}".format(service))
-        except SystemExit as e:
-            log_error("Restart {} failed with error {}".format(service, e))
-            raise
+    for services in SERVICES_RESTART_WAVES:
+        # on Mellanox platform pmon is started by syncd
+        if asic_type == 'mellanox':
+            services = [service for service in services if service != 'pmon']
+        _run_systemctl('restart', services, "Restarting services", "Restart")
+
+class _PhaseTimer(object):
+    """Time the phases of a long running command
+    """
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        yield
+        self.phases.append((name, time.time() - start))
+
+    def report(self):
+        click.echo("Time per phase:")
+        for name, duration in self.phases + [('total', sum(d for _, d in self.phases))]:
+            click.echo("  {:<24}{:8.2f}s".format(name, duration))
+        log_info("Phase times: " + ", ".join("{} {:.2f}s".format(name, duration) for name, duration in self.phases))
+
+def _read_config_file(filename):
+    """Read the tables of a config DB dump file, i.e. its upper case keys,
+       like 'sonic-cfggen -j <filename> --write-to-db' does
+    """
+    try:
+        with open(filename) as f:
+            data = json.load(f)
+    except (IOError, ValueError) as e:
+        click.echo("Could not read config from {}: {}".format(filename, e))
+        sys.exit(1)
+    return dict((table, entries) for table, entries in data.items() if table[:1].isupper())
+
+def _get_sysinfo_config(filename):
+    """Return the platform and hwsku default config for the HWSKU of a
+       config DB dump file, as 'sonic-cfggen -H -k <hwsku>' writes it
+    """
+    command = "{} -j {} -v DEVICE_METADATA.localhost.hwsku".format(SONIC_CFGGEN_PATH, filename)
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
+    cfg_hwsku, err = proc.communicate()
+    if err or proc.returncode != 0:
+        click.echo("Could not get the HWSKU from config file, exiting")
+        sys.exit(1)
+
+    command = "{} -H -k {} --print-data".format(SONIC_CFGGEN_PATH, cfg_hwsku.strip())
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        click.echo("Could not get the system information for HWSKU {}, exiting".format(cfg_hwsku.strip()))
+        sys.exit(1)
+    return dict((table, entries) for table, entries in json.loads(out).items() if table[:1].isupper())
+
+# Tables that are only read when services start: changing them live takes
+# no effect until the services are restarted
+RESTART_TABLES = ['DEVICE_METADATA', 'MGMT_INTERFACE', 'MGMT_VRF_CONFIG']
+
+def _load_config_delta(filename):
+    """Apply a config DB dump file on top of the running config like
+       'config load', writing only the entries that differ in one transaction
+    """
+    config_data = _read_config_file(filename)
+    config_db = ConfigDBConnector()
+    config_db.connect()
+    batch_db = BatchConfigDB(config_db, config_data.keys())
+    delta = batch_db.mod_config_delta(config_data)
+
+    if delta:
+        header = ['Table', 'Key', 'Change', 'Fields']
+        body = []
+        for table, key, fields in delta:
+            key = config_db.serialize_key(key)
+            if fields is None:
+                body.append([table, key, 'add', ''])
+            else:
+                body.append([table, key, 'modify', ','.join(fields)])
+        click.echo(tabulate(body, header))
+    batch_db.commit()
+
+    added = len([fields for _, _, fields in delta if fields is None])
+    click.echo("{} entries added, {} entries modified".format(added, len(delta) - added))
+
+    restart_tables = sorted(set(table for table, _, _ in delta if table in RESTART_TABLES))
+    if restart_tables:
+        click.echo("Changes to {} only take effect when services restart, run 'config reload' to apply them".format(
+            ', '.join(restart_tables)))
+
+def _migrate_config(config_db):
+    """Migrate config DB contents to the latest version with db_migrator.py
+    """
+    db_migrator = load_script('db_migrator.py')
+    if db_migrator is not None:
+        db_migrator.DBMigrator(config_db=config_db).migrate()
 
 def is_ipaddress(val):
     """ Validate if an entry is a valid IP """
@@ -499,11 +557,15 @@ def save(filename):
 
 @config.command()
 @click.option('-y', '--yes', is_flag=True)
+@click.option('-d', '--diff', is_flag=True, help='Only write the entries that differ from the running config, and show them')
 @click.argument('filename', default='/etc/sonic/config_db.json', type=click.Path(exists=True))
-def load(filename, yes):
+def load(filename, yes, diff):
     """Import a previous saved config DB dump file."""
     if not yes:
         click.confirm('Load config from the file %s?' % filename, abort=True)
+    if diff:
+        _load_config_delta(filename)
+        return
     command = "{} -j {} --write-to-db".format(SONIC_CFGGEN_PATH, filename)
     run_command(command, display_cmd=True)
 
@@ -517,40 +579,40 @@ def reload(filename, yes, load_sysinfo):
         click.confirm('Clear current config and reload config from the file %s?' % filename, abort=True)
 
     log_info("'reload' executing...")
+    timer = _PhaseTimer()
 
-    if load_sysinfo:
-        command = "{} -j {} -v DEVICE_METADATA.localhost.hwsku".format(SONIC_CFGGEN_PATH, filename)
-        proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
-        cfg_hwsku, err = proc.communicate()
-        if err:
-            click.echo("Could not get the HWSKU from config file, exiting")
-            sys.exit(1)
-        else:
-            cfg_hwsku = cfg_hwsku.strip()
+    # Everything is read before the services are stopped, so that a broken
+    # file does not leave the device without configuration
+    with timer.phase('read config'):
+        sysinfo = _get_sysinfo_config(filename) if load_sysinfo else None
+        config_data = _read_config_file(filename)
 
     #Stop services before config push
-    _stop_services()
-    config_db = ConfigDBConnector()
-    config_db.connect()
-    client = config_db.get_redis_client(config_db.CONFIG_DB)
-    client.flushdb()
-    if load_sysinfo:
-        command = "{} -H -k {} --write-to-db".format(SONIC_CFGGEN_PATH, cfg_hwsku)
-        run_command(command, display_cmd=True)
-
-    command = "{} -j {} --write-to-db".format(SONIC_CFGGEN_PATH, filename)
-    run_command(command, display_cmd=True)
-    client.set(config_db.INIT_INDICATOR, 1)
-
-    # Migrate DB contents to latest version
-    db_migrator='/usr/bin/db_migrator.py'
-    if os.path.isfile(db_migrator) and os.access(db_migrator, os.X_OK):
-        run_command(db_migrator + ' -o migrate')
+    with timer.phase('stop services'):
+        _stop_services()
+
+    # Build the new config in memory, migrate it to the latest version and
+    # replace CONFIG_DB with it in one transaction
+    with timer.phase('migrate config'):
+        config_db = ConfigDBConnector()
+        config_db.connect()
+        new_config = BatchConfigDB(config_db, None)
+        if sysinfo:
+            new_config.mod_config(sysinfo)
+        new_config.mod_config(config_data)
+        _migrate_config(new_config)
+
+    with timer.phase('write config'):
+        new_config.commit(flush=True)
 
     # We first run "systemctl reset-failed" to remove the "failed"
     # status from all services before we attempt to restart them
-    _reset_failed_services()
-    _restart_services()
+    with timer.phase('reset failed services'):
+        _reset_failed_services()
+    with timer.phase('restart services'):
+        _restart_services()
+
+    timer.report()
 
 @config.command()
 @click.option('-y', '--yes', is_flag=True, callback=_abort_if_false,
@@ -644,6 +706,82 @@ def hostname(new_hostname):
         raise
     click.echo("Please note loaded setting will be lost after system reboot. To preserve setting, run `config save`.")
 
+#
+# 'batch' command ('config batch ...')
+#
+
+# Tables read and written by the commands that can be batched
+BATCH_TABLES = ['VLAN', 'VLAN_MEMBER', 'PORTCHANNEL', 'PORTCHANNEL_MEMBER',
+                'INTERFACE', 'PORTCHANNEL_INTERFACE', 'VLAN_INTERFACE',
+                'LOOPBACK_INTERFACE', 'VLAN_SUB_INTERFACE']
+
+# Commands accepted by 'config batch', as their path under 'config'. They
+# only touch BATCH_TABLES and have no side effect besides the DB writes.
+BATCH_COMMANDS = [
+    ('vlan', 'add'),
+    ('vlan', 'del'),
+    ('vlan', 'member', 'add'),
+    ('vlan', 'member', 'del'),
+    ('portchannel', 'add'),
+    ('portchannel', 'del'),
+    ('portchannel', 'member', 'add'),
+    ('portchannel', 'member', 'del'),
+    ('interface', 'ip', 'add'),
+]
+
+def _get_batch_command(words):
+    """Return the command of BATCH_COMMANDS a batch line starts with and
+       the remaining words as its arguments, (None, None) if there is none
+    """
+    for path in BATCH_COMMANDS:
+        if tuple(words[:len(path)]) == path:
+            command = config
+            for name in path:
+                command = command.commands[name]
+            return command, words[len(path):]
+    return None, None
+
+@config.command('batch')
+@click.argument('filename', metavar='[<filename>]', default='-', type=click.File('r'))
+@click.pass_context
+def batch(ctx, filename):
+    """Apply vlan, portchannel and interface ip commands read from a file or stdin in one transaction"""
+    config_db = ConfigDBConnector()
+    config_db.connect()
+    batch_db = BatchConfigDB(config_db, BATCH_TABLES)
+
+    count = 0
+    for line_num, line in enumerate(filename, 1):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as e:
+            ctx.fail("line {}: {}".format(line_num, e))
+        if words[:1] == ['config']:
+            words = words[1:]
+        if not words:
+            continue
+
+        command, args = _get_batch_command(words)
+        if command is None:
+            ctx.fail("line {}: '{}' can not be batched".format(line_num, ' '.join(words)))
+        # Changing the management IP restarts services, it is not batched
+        if words[:4] == ['interface', 'ip', 'add', 'eth0']:
+            ctx.fail("line {}: the management interface can not be batched".format(line_num))
+
+        try:
+            sub_ctx = command.make_context(' '.join(words[:len(words) - len(args)]), args,
+                                           obj={'db': batch_db, 'config_db': batch_db})
+            with sub_ctx:
+                command.invoke(sub_ctx)
+        except click.ClickException as e:
+            ctx.fail("line {}: {}".format(line_num, e.format_message()))
+        except click.Abort:
+            ctx.fail("line {}: aborted".format(line_num))
+        count += 1
+
+    changes = batch_db.commit()
+    click.echo("Applied {} commands, {} entries changed".format(count, changes))
+
 #
 # 'portchannel' group ('config portchannel ...')
 #
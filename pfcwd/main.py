@@ -6,6 +6,8 @@ import os
 from tabulate import tabulate
 from natsort import natsorted
 
+from utilities_common.bulkdb import BulkReader
+
 # Default configuration
 DEFAULT_DETECTION_TIME = 200
 DEFAULT_RESTORATION_TIME = 200
@@ -28,6 +30,7 @@ CONFIG_DESCRIPTION = [
 ]
 
 STATS_HEADER = ('QUEUE', 'STATUS',) + zip(*STATS_DESCRIPTION)[0]
+STATS_FIELDS = ['PFC_WD_STATUS'] + [field for stat in STATS_DESCRIPTION for field in stat[1:]]
 CONFIG_HEADER = ('PORT',) + zip(*CONFIG_DESCRIPTION)[0]
 
 CONFIG_DB_PFC_WD_TABLE_NAME = 'PFC_WD'
@@ -37,10 +40,6 @@ CONFIG_DB_PFC_WD_TABLE_NAME = 'PFC_WD'
 def cli():
     """ SONiC PFC Watchdog """
 
-def get_all_queues(db):
-    queue_names = db.get_all(db.COUNTERS_DB, 'COUNTERS_QUEUE_NAME_MAP')
-    return natsorted(queue_names.keys())
-
 def get_all_ports(db):
     all_port_names = db.get_all(db.COUNTERS_DB, 'COUNTERS_PORT_NAME_MAP')
 
@@ -70,22 +69,50 @@ def show():
 # Show stats
 @show.command()
 @click.option('-e', '--empty', is_flag = True)
+@click.option('-p', '--ports', help = 'Comma separated list of ports to show the queues of')
+@click.option('-s', '--server-facing', is_flag = True, help = 'Show the queues of server facing ports only')
 @click.argument('queues', nargs = -1)
-def stats(empty, queues):
+def stats(empty, ports, server_facing, queues):
     """ Show PFC Watchdog stats per queue """
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.COUNTERS_DB)
+    reader = BulkReader(db)
     table = []
 
-    if len(queues) == 0:
-        queues = get_all_queues(db)
+    queue_oids = db.get_all(db.COUNTERS_DB, 'COUNTERS_QUEUE_NAME_MAP') or {}
 
-    for queue in queues:
-        stats_list = []
-        queue_oid = db.get(db.COUNTERS_DB, 'COUNTERS_QUEUE_NAME_MAP', queue)
-        stats = db.get_all(db.COUNTERS_DB, 'COUNTERS:' + queue_oid)
-        if stats is None:
+    if len(queues) == 0:
+        queues = natsorted(queue_oids.keys())
+
+    # Narrow the queues down to the requested ports before reading any stats
+    port_filter = None
+    if ports:
+        port_filter = set(ports.split(','))
+    if server_facing:
+        configdb = swsssdk.ConfigDBConnector()
+        configdb.connect()
+        server_facing_ports = set(get_server_facing_ports(configdb))
+        port_filter = server_facing_ports if port_filter is None else port_filter & server_facing_ports
+    if port_filter is not None:
+        queues = [queue for queue in queues if queue.split(':')[0] in port_filter]
+
+    queues = [queue for queue in queues if queue in queue_oids]
+    counters_keys = ['COUNTERS:' + queue_oids[queue] for queue in queues]
+    queue_stats = reader.hmget_bulk(db.COUNTERS_DB, counters_keys, STATS_FIELDS)
+
+    # Queues without any PFC watchdog stat are only shown with --empty,
+    # as long as their counters exist
+    existing = {}
+    if empty:
+        missing = [key for key in counters_keys if not any(queue_stats[key])]
+        existing = dict(zip(missing, reader.pipelined(db.COUNTERS_DB, missing,
+                                                      lambda pipe, key: pipe.exists(key))))
+
+    for queue, key in zip(queues, counters_keys):
+        stats = dict((field, value) for field, value in zip(STATS_FIELDS, queue_stats[key]) if value is not None)
+        if not stats and not existing.get(key):
             continue
+        stats_list = []
         for stat in STATS_DESCRIPTION:
             line = stats.get(stat[1], '0') + '/' + stats.get(stat[2], '0')
             stats_list.append(line)
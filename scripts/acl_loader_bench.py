@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#####################################################################
+#
+# acl_loader_bench.py measures how long acl-loader takes to parse and
+# convert a synthetic openconfig ACL file of a given size, serially
+# and with the ACL tables converted in parallel.
+#
+# The rules are converted for existing ACL tables, so run it on a
+# switch (nothing is written to Config DB) or with --mock against the
+# unit test mock DB, which has the DATAACL, SNMP_ACL and SSH_ONLY
+# tables.
+#
+# This is a developer tool, run it from the source tree: it is not
+# installed.
+#
+#####################################################################
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_TABLES = 'DATAACL,SNMP_ACL,SSH_ONLY'
+
+# A few ports shared by many rules, like in real ACL files
+PORTS = ['22', '53', '80', '161', '443', '1024..65535']
+
+
+def use_mock_db():
+    modules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    tests_path = os.path.join(modules_path, "sonic-utilities-tests")
+    sys.path.insert(0, modules_path)
+    sys.path.insert(0, tests_path)
+    import mock_tables.dbconnector
+
+
+def gen_entry(seq):
+    """
+        Build an openconfig ACL entry, one IPv6 rule for every three IPv4 rules.
+    """
+    if seq % 4 == 3:
+        src = 'fc00:%x:%x::/64' % (seq >> 16, seq & 0xffff)
+        dst = 'fc01::/16'
+    else:
+        src = '10.%d.%d.0/24' % ((seq >> 8) & 0xff, seq & 0xff)
+        dst = '192.168.0.0/16'
+    return {
+        'config': {'sequence-id': seq},
+        'actions': {'config': {'forwarding-action': 'ACCEPT'}},
+        'ip': {'config': {'protocol': 'IP_TCP' if seq % 2 else 'IP_UDP',
+                          'source-ip-address': src,
+                          'destination-ip-address': dst}},
+        'transport': {'config': {'destination-port': PORTS[seq % len(PORTS)]}},
+    }
+
+
+def generate(path, tables, count):
+    """
+        Write count rules spread over tables to an openconfig ACL file.
+    """
+    acl_sets = {}
+    per_table = (count + len(tables) - 1) // len(tables)
+    for pos, table in enumerate(tables):
+        first = pos * per_table
+        entries = dict((str(seq), gen_entry(seq)) for seq in range(first + 1, min(first + per_table, count) + 1))
+        acl_sets[table] = {'config': {'name': table}, 'acl-entries': {'acl-entry': entries}}
+
+    with open(path, 'w') as f:
+        json.dump({'acl': {'acl-sets': {'acl-set': acl_sets}}}, f)
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return result, time.time() - start
+
+
+def convert(acl_loader, yang_acl, jobs):
+    acl_loader.yang_acl = yang_acl
+    acl_loader.rules_info = {}
+    acl_loader.convert_rules(jobs)
+    return len(acl_loader.rules_info)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark acl-loader on a synthetic ACL file',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-n', '--rules', type=int, default=10000, help='Number of rules to generate')
+    parser.add_argument('-t', '--tables', default=DEFAULT_TABLES, help='Comma separated ACL tables to spread the rules over')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Number of processes for the parallel conversion')
+    parser.add_argument('--mock', action='store_true', help='Use the unit test mock DB instead of redis')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated ACL file')
+    args = parser.parse_args()
+
+    if args.rules < 1:
+        parser.error('--rules must be positive')
+
+    if args.mock:
+        use_mock_db()
+
+    from acl_loader.main import AclLoader
+
+    tables = args.tables.split(',')
+    fd, path = tempfile.mkstemp(prefix='acl-bench-', suffix='.json')
+    os.close(fd)
+
+    try:
+        _, t_gen = timed(lambda: generate(path, tables, args.rules))
+        print "Generated %d rules in %d tables in %.3f seconds" % (args.rules, len(tables), t_gen)
+
+        acl_loader = AclLoader()
+        acl_loader.set_max_priority(args.rules + 1)
+
+        yang_acl, t_parse = timed(lambda: AclLoader.parse_acl_json(path))
+        converted, t_serial = timed(lambda: convert(acl_loader, yang_acl, 1))
+        _, t_parallel = timed(lambda: convert(acl_loader, yang_acl, args.jobs))
+        diff, t_diff = timed(acl_loader.diff_rules)
+
+        print "parse:                         %.3f seconds" % t_parse
+        print "convert:                       %.3f seconds" % t_serial
+        print "convert, %2d jobs:              %.3f seconds" % (args.jobs, t_parallel)
+        print "diff against Config DB:        %.3f seconds" % t_diff
+        print "converted rules: %d, to add: %d, to modify: %d, to delete: %d" % (
+            converted, len(diff.added), len(diff.modified), len(diff.removed))
+    finally:
+        if args.keep:
+            print "ACL file kept in %s" % path
+        else:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
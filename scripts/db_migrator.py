@@ -23,7 +23,7 @@ def log_error(msg):
 
 
 class DBMigrator():
-    def __init__(self, socket=None):
+    def __init__(self, socket=None, config_db=None):
         """
         Version string format:
            version_<major>_<minor>_<build>
@@ -34,6 +34,10 @@ class DBMigrator():
                      github public branches. These private branches shall use
                      none-zero values.
               build: sequentially increase within a minor version domain.
+
+        The migration works on config_db if given, e.g. an in-memory
+        configuration that is not written to CONFIG_DB yet, otherwise
+        on CONFIG_DB.
         """
         self.CURRENT_VERSION = 'version_1_0_2'
 
@@ -41,6 +45,10 @@ class DBMigrator():
         self.TABLE_KEY       = 'DATABASE'
         self.TABLE_FIELD     = 'VERSION'
 
+        if config_db is not None:
+            self.configDB    = config_db
+            return
+
         db_kwargs = {}
         if socket:
             db_kwargs['unix_socket_path'] = socket
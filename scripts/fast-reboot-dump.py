@@ -10,24 +10,40 @@ from fcntl import ioctl
 import binascii
 import argparse
 import syslog
+import threading
+import time
 import traceback
 
+from utilities_common.asic_objects import AsicObjectMaps
+from utilities_common.bulkdb import BulkReader
+
 
 ARP_CHUNK = binascii.unhexlify('08060001080006040001') # defines a part of the packet for ARP Request
 ARP_PAD = binascii.unhexlify('00' * 18)
+GARP_BATCH_SIZE = 256
 
-def generate_arp_entries(filename, all_available_macs):
+def get_neigh_entries():
+    """
+        Read the whole NEIGH_TABLE with one SCAN and a pipelined HGETALL,
+        returning (key, entry) pairs
+    """
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.APPL_DB, False)   # Make one attempt only
 
+    reader = BulkReader(db)
+    keys = reader.scan_keys(db.APPL_DB, 'NEIGH_TABLE:*')
+    entries = reader.get_all_bulk(db.APPL_DB, keys)
+
+    db.close(db.APPL_DB)
+
+    return [(key, entries[key]) for key in keys if entries[key] is not None]
+
+def generate_arp_entries(filename, neigh_entries, all_available_macs):
     arp_output = []
     arp_entries = []
-    keys = db.keys(db.APPL_DB, 'NEIGH_TABLE:*')
-    keys = [] if keys is None else keys
-    for key in keys:
+    for key, entry in neigh_entries:
         vlan_name = key.split(':')[1]
         ip_addr = key.split(':')[2]
-        entry = db.get_all(db.APPL_DB, key)
         if (vlan_name, entry['neigh'].lower()) not in all_available_macs:
             # FIXME: print me to log
             continue
@@ -38,8 +54,6 @@ def generate_arp_entries(filename, all_available_macs):
         arp_entries.append((vlan_name, entry['neigh'].lower(), ip_addr))
         arp_output.append(obj)
 
-    db.close(db.APPL_DB)
-
     with open(filename, 'w') as fp:
         json.dump(arp_output, fp, indent=2, separators=(',', ': '))
 
@@ -56,37 +70,9 @@ def get_vlan_ifaces():
 
     return vlans
 
-def get_bridge_port_id_2_port_id(db):
-    bridge_port_id_2_port_id = {}
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
-        port_type = value['SAI_BRIDGE_PORT_ATTR_TYPE']
-        if port_type != 'SAI_BRIDGE_PORT_TYPE_PORT':
-            continue
-        port_id = value['SAI_BRIDGE_PORT_ATTR_PORT_ID']
-        # ignore admin status
-        bridge_id = key.replace('ASIC_STATE:SAI_OBJECT_TYPE_BRIDGE_PORT:', '')
-        bridge_port_id_2_port_id[bridge_id] = port_id
-
-    return bridge_port_id_2_port_id
-
-def get_map_port_id_2_iface_name(db):
-    port_id_2_iface = {}
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_HOSTIF:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
-        port_id = value['SAI_HOSTIF_ATTR_OBJ_ID']
-        iface_name = value['SAI_HOSTIF_ATTR_NAME']
-        port_id_2_iface[port_id] = iface_name
-
-    return port_id_2_iface
-
-def get_map_bridge_port_id_2_iface_name(db):
-    bridge_port_id_2_port_id = get_bridge_port_id_2_port_id(db)
-    port_id_2_iface = get_map_port_id_2_iface_name(db)
+def get_map_bridge_port_id_2_iface_name(maps):
+    bridge_port_id_2_port_id = maps.get_port_bridge_ports()
+    port_id_2_iface = maps.get_hostif_names()
 
     bridge_port_id_2_iface_name = {}
 
@@ -98,41 +84,57 @@ def get_map_bridge_port_id_2_iface_name(db):
 
     return bridge_port_id_2_iface_name
 
-def get_vlan_oid_by_vlan_id(db, vlan_id):
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_VLAN:oid:*')
-    keys = [] if keys is None else keys
-    for key in keys:
-        value = db.get_all(db.ASIC_DB, key)
-        if 'SAI_VLAN_ATTR_VLAN_ID' in value and int(value['SAI_VLAN_ATTR_VLAN_ID']) == vlan_id:
-            return key.replace('ASIC_STATE:SAI_OBJECT_TYPE_VLAN:', '')
+def get_vlan_oid_by_vlan_id(maps, vlan_id):
+    bvid = maps.get_vlan_oid(vlan_id)
+    if bvid is None:
+        raise Exception('Not found bvi oid for vlan_id: %d' % vlan_id)
 
-    raise Exception('Not found bvi oid for vlan_id: %d' % vlan_id)
+    return bvid
 
-def get_fdb(db, vlan_name, vlan_id, bridge_id_2_iface):
+def get_fdb_keys_by_bvid(reader, db):
+    """
+        Read all the FDB entries of ASIC_DB in one SCAN and return their keys
+        grouped by bvid, instead of a KEYS over the whole DB per vlan.
+    """
+    prefix = 'ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:'
+    fdb_keys = {}
+    for key in reader.scan_keys(db.ASIC_DB, prefix + '*'):
+        key_obj = json.loads(key.replace(prefix, ''))
+        if 'bvid' in key_obj:
+            fdb_keys.setdefault(key_obj['bvid'], []).append((key, key_obj))
+
+    return fdb_keys
+
+def get_fdb(reader, db, vlan_name, vlan_id, bvid, fdb_keys, bridge_id_2_iface):
     fdb_types = {
       'SAI_FDB_ENTRY_TYPE_DYNAMIC': 'dynamic',
       'SAI_FDB_ENTRY_TYPE_STATIC' : 'static'
     }
 
-    bvid = get_vlan_oid_by_vlan_id(db, vlan_id)
     available_macs = set()
     map_mac_ip = {}
     fdb_entries = []
-    keys = db.keys(db.ASIC_DB, 'ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:{*\"bvid\":\"%s\"*}' % bvid)
-    keys = [] if keys is None else keys
-    for key in keys:
-        key_obj = json.loads(key.replace('ASIC_STATE:SAI_OBJECT_TYPE_FDB_ENTRY:', ''))
+    unicast_keys = []
+    for key, key_obj in fdb_keys:
         mac = str(key_obj['mac'])
         if not is_mac_unicast(mac):
             continue
         available_macs.add((vlan_name, mac.lower()))
+        unicast_keys.append((key, mac))
+
+    # get attributes
+    values = reader.hmget_bulk(db.ASIC_DB, [key for key, _ in unicast_keys],
+                               ['SAI_FDB_ENTRY_ATTR_TYPE', 'SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID'])
+    for key, mac in unicast_keys:
         fdb_mac = mac.replace(':', '-')
-        # get attributes
-        value = db.get_all(db.ASIC_DB, key)
-        fdb_type = fdb_types[value['SAI_FDB_ENTRY_ATTR_TYPE']]
-        if value['SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID'] not in bridge_id_2_iface:
+        ent_type, bridge_port_id = values[key]
+        if ent_type is None:
+            # Aged out since the SCAN
+            continue
+        fdb_type = fdb_types[ent_type]
+        if bridge_port_id not in bridge_id_2_iface:
             continue
-        fdb_port = bridge_id_2_iface[value['SAI_FDB_ENTRY_ATTR_BRIDGE_PORT_ID']]
+        fdb_port = bridge_id_2_iface[bridge_port_id]
 
         obj = {
           'FDB_TABLE:Vlan%d:%s' % (vlan_id, fdb_mac) : {
@@ -153,15 +155,20 @@ def generate_fdb_entries(filename):
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
     db.connect(db.ASIC_DB, False)   # Make one attempt only
 
-    bridge_id_2_iface = get_map_bridge_port_id_2_iface_name(db)
+    reader = BulkReader(db)
+    maps = AsicObjectMaps(db, reader=reader)
+    bridge_id_2_iface = get_map_bridge_port_id_2_iface_name(maps)
 
     vlan_ifaces = get_vlan_ifaces()
+    fdb_keys = get_fdb_keys_by_bvid(reader, db)
 
     all_available_macs = set()
     map_mac_ip_per_vlan = {}
     for vlan in vlan_ifaces:
         vlan_id = int(vlan.replace('Vlan', ''))
-        fdb_entry, available_macs, map_mac_ip_per_vlan[vlan] = get_fdb(db, vlan, vlan_id, bridge_id_2_iface)
+        bvid = get_vlan_oid_by_vlan_id(maps, vlan_id)
+        fdb_entry, available_macs, map_mac_ip_per_vlan[vlan] = get_fdb(reader, db, vlan, vlan_id, bvid,
+                                                                       fdb_keys.get(bvid, []), bridge_id_2_iface)
         all_available_macs |= available_macs
         fdb_entries.extend(fdb_entry)
 
@@ -186,7 +193,7 @@ def get_iface_ip_addr(iff):
     SIOCGIFADDR = 0x8915            # Get ip address
     return get_if(iff, SIOCGIFADDR)[20:24]
 
-def send_arp(s, src_mac, src_ip, dst_mac_s, dst_ip_s):
+def make_arp(src_mac, src_ip, dst_mac_s, dst_ip_s):
     # convert dst_mac in binary
     dst_ip = socket.inet_aton(dst_ip_s)
 
@@ -194,14 +201,14 @@ def send_arp(s, src_mac, src_ip, dst_mac_s, dst_ip_s):
     dst_mac = binascii.unhexlify(dst_mac_s.replace(':', ''))
 
     # make ARP packet
-    pkt = dst_mac + src_mac + ARP_CHUNK + src_mac + src_ip + dst_mac + dst_ip + ARP_PAD
-
-    # send it
-    s.send(pkt)
-
-    return
-
-def garp_send(arp_entries, map_mac_ip_per_vlan):
+    return dst_mac + src_mac + ARP_CHUNK + src_mac + src_ip + dst_mac + dst_ip + ARP_PAD
+
+def garp_send(arp_entries, map_mac_ip_per_vlan, deadline=None):
+    """
+        Send the ARP packets, built up front and grouped per source interface.
+        Sending stops once the deadline passes; returns the number of
+        packets sent.
+    """
     ETH_P_ALL = 0x03
 
     # generate source ip addresses for arp packets
@@ -211,36 +218,35 @@ def garp_send(arp_entries, map_mac_ip_per_vlan):
     src_ifs = {map_mac_ip_per_vlan[vlan_name][dst_mac] for vlan_name, dst_mac, _ in arp_entries}
     src_mac_addrs = {src_if:get_iface_mac_addr(src_if) for src_if in src_ifs}
 
+    # build the arp packets of each interface
+    packets = {src_if: [] for src_if in src_ifs}
+    for vlan_name, dst_mac, dst_ip in arp_entries:
+        src_if = map_mac_ip_per_vlan[vlan_name][dst_mac]
+        packets[src_if].append(make_arp(src_mac_addrs[src_if], src_ip_addrs[vlan_name], dst_mac, dst_ip))
+
     # open raw sockets for all required interfaces
     sockets = {}
     for src_if in src_ifs:
         sockets[src_if] = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
         sockets[src_if].bind((src_if, 0))
 
-    # send arp packets
-    for vlan_name, dst_mac, dst_ip in arp_entries:
-        src_if = map_mac_ip_per_vlan[vlan_name][dst_mac]
-        send_arp(sockets[src_if], src_mac_addrs[src_if], src_ip_addrs[vlan_name], dst_mac, dst_ip)
-
-    # close the raw sockets
-    for s in sockets.values():
-        s.close()
-
-    return
-
-def get_default_entries(db, route):
-    key = 'ROUTE_TABLE:%s' % route
-    keys = db.keys(db.APPL_DB, key)
-    if keys is None:
-        return None
-
-    entry = db.get_all(db.APPL_DB, key)
-    obj = {
-        key: entry,
-        'OP': 'SET'
-    }
+    # send arp packets, checking the deadline once per batch
+    sent = 0
+    try:
+        for src_if, pkts in packets.items():
+            send = sockets[src_if].send
+            for start in range(0, len(pkts), GARP_BATCH_SIZE):
+                if deadline is not None and time.time() > deadline:
+                    return sent
+                for pkt in pkts[start:start + GARP_BATCH_SIZE]:
+                    send(pkt)
+                sent += len(pkts[start:start + GARP_BATCH_SIZE])
+    finally:
+        # close the raw sockets
+        for s in sockets.values():
+            s.close()
 
-    return obj
+    return sent
 
 def generate_default_route_entries(filename):
     db = swsssdk.SonicV2Connector(host='127.0.0.1')
@@ -248,13 +254,14 @@ def generate_default_route_entries(filename):
 
     default_routes_output = []
 
-    ipv4_default = get_default_entries(db, '0.0.0.0/0')
-    if ipv4_default is not None:
-        default_routes_output.append(ipv4_default)
-
-    ipv6_default = get_default_entries(db, '::/0')
-    if ipv6_default is not None:
-        default_routes_output.append(ipv6_default)
+    keys = ['ROUTE_TABLE:0.0.0.0/0', 'ROUTE_TABLE:::/0']
+    entries = BulkReader(db).get_all_bulk(db.APPL_DB, keys)
+    for key in keys:
+        if entries[key] is not None:
+            default_routes_output.append({
+                key: entries[key],
+                'OP': 'SET'
+            })
 
     db.close(db.APPL_DB)
 
@@ -262,18 +269,96 @@ def generate_default_route_entries(filename):
         json.dump(default_routes_output, fp, indent=2, separators=(',', ': '))
 
 
+class PhaseTimer(object):
+    """
+        Record the time spent in each phase of the dump
+    """
+    def __init__(self):
+        self.start = time.time()
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def timed(self, name, func, *args):
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            with self.lock:
+                self.phases.append((name, start - self.start, time.time() - start))
+
+    def report(self):
+        lines = ["%-16s started at %.3fs, took %.3fs" % phase for phase in self.phases]
+        lines.append("%-16s %.3fs" % ('total', time.time() - self.start))
+        return lines
+
+
+class Phase(threading.Thread):
+    """
+        Run a phase of the dump in its own thread
+    """
+    def __init__(self, timer, name, func, *args):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.timer = timer
+        self.func = func
+        self.args = args
+        self.result = None
+        self.exc_info = None
+
+    def run(self):
+        try:
+            self.result = self.timer.timed(self.name, self.func, *self.args)
+        except Exception:
+            self.exc_info = sys.exc_info()
+
+    def wait(self):
+        """
+            Wait for the phase and return its result, re-raising its exception
+        """
+        self.join()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-t', '--target', type=str, default='/tmp', help='target directory for files')
+    parser.add_argument('-b', '--budget', type=float, default=0,
+                        help='time budget in seconds for sending the gratuitous ARPs, those not sent within it '
+                             'are skipped (0: no limit)')
+    parser.add_argument('--timing', action='store_true', help='print the time spent in each phase')
     args = parser.parse_args()
     root_dir = args.target
     if not os.path.isdir(root_dir):
         print "Target directory '%s' not found" % root_dir
         return 3
-    all_available_macs, map_mac_ip_per_vlan = generate_fdb_entries(root_dir + '/fdb.json')
-    arp_entries = generate_arp_entries(root_dir + '/arp.json', all_available_macs)
-    generate_default_route_entries(root_dir + '/default_routes.json')
-    garp_send(arp_entries, map_mac_ip_per_vlan)
+
+    # FDB, neighbor and default route reads are independent of each other;
+    # only the ARP dump needs both the FDB and the neighbors
+    timer = PhaseTimer()
+    fdb = Phase(timer, 'fdb', generate_fdb_entries, root_dir + '/fdb.json')
+    neigh = Phase(timer, 'neigh', get_neigh_entries)
+    routes = Phase(timer, 'default_routes', generate_default_route_entries, root_dir + '/default_routes.json')
+    for phase in (fdb, neigh, routes):
+        phase.start()
+
+    all_available_macs, map_mac_ip_per_vlan = fdb.wait()
+    arp_entries = timer.timed('arp', generate_arp_entries, root_dir + '/arp.json', neigh.wait(), all_available_macs)
+    routes.wait()
+
+    # The budget only covers sending the gratuitous ARPs, the dump files
+    # above are always written
+    deadline = time.time() + args.budget if args.budget > 0 else None
+    sent = timer.timed('garp', garp_send, arp_entries, map_mac_ip_per_vlan, deadline)
+    if sent < len(arp_entries):
+        syslog.syslog(syslog.LOG_WARNING, "Time budget of %.1fs exhausted, sent %d of %d gratuitous ARPs" %
+                      (args.budget, sent, len(arp_entries)))
+
+    for line in timer.report():
+        syslog.syslog(syslog.LOG_INFO, line)
+        if args.timing:
+            print line
     return 0
 
 if __name__ == '__main__':
@@ -6,13 +6,40 @@ import sys
 import getopt
 import ipaddress
 import json
-from swsssdk import ConfigDBConnector
+import time
+import redis
+from swsssdk import SonicV2Connector
+
+from utilities_common.bulkdb import BATCH_SIZE, BulkReader
 
 os.environ['PYTHONUNBUFFERED']='True'
 
 PREFIX_SEPARATOR = '/'
 IPV6_SEPARATOR = ':'
 
+ROUTE_TABLE_PREFIX = 'ROUTE_TABLE:'
+INTF_TABLE_PREFIX = 'INTF_TABLE:'
+ASIC_ROUTE_ENTRY_PREFIX = 'ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:'
+ASIC_DEST_FIELD = '"dest":"'
+
+# Mismatch categories as reported in the results
+MISSED_ROUTES = "missed_ROUTE_TABLE_routes"
+MISSED_INTF = "missed_INTF_TABLE_entries"
+UNACCOUNTED_ENTRIES = "Unaccounted_ROUTE_ENTRY_TABLE_entries"
+
+# Daemon mode defaults, in seconds
+DEFAULT_INTERVAL = 1
+DEFAULT_GRACE = 30
+POLL_TIMEOUT = 0.1
+DEFAULT_RESYNC = 300
+RECONNECT_DELAY = 1
+
+# Keyspace notifications for hash (h) and generic (g) commands, such as
+# HSET and DEL, are needed to follow the tables; 'A' includes both
+NOTIFY_KEYSPACE_EVENTS = 'notify-keyspace-events'
+KEYSPACE_EVENTS = 'Kgh'
+KEYSPACE_EVENTS_ALL_CLASSES = 'g$lshzxe'
+
 # Modes of operation from quiet to noisy
 MODE_QUIET = 0
 MODE_ERR = 1
@@ -55,92 +82,109 @@ def ip_subnet(ip):
         net = ipaddress.IPv6Network(ip, False)
     return net.with_prefixlen
 
-def cmps(s1, s2):
-    if (s1 == s2):
-        return 0
-    if (s1 < s2):
-        return -1
-    return 1
-
 def do_diff(t1, t2):
-    t1_x = t2_x = 0
-    t1_miss = []
-    t2_miss = []
-    t1_len = len(t1);
-    t2_len = len(t2);
-    while t1_x < t1_len and t2_x < t2_len:
-        d = cmps(t1[t1_x], t2[t2_x])
-        if (d == 0):
-            t1_x += 1
-            t2_x += 1
-        elif (d < 0):
-            t1_miss.append(t1[t1_x])
-            t1_x += 1
-        else:
-            t2_miss.append(t2[t2_x])
-            t2_x += 1
+    """
+        Return the entries only found in t1 and the entries only found in t2,
+        both sorted.
+    """
+    s1 = set(t1)
+    s2 = set(t2)
+    return sorted(s1 - s2), sorted(s2 - s1)
+
+
+def missing_keyspace_events(events):
+    """
+        Return the notify-keyspace-events flags needed by the daemon that
+        are not set in events.
+    """
+    enabled = set(events)
+    if 'A' in enabled:
+        enabled.update(KEYSPACE_EVENTS_ALL_CLASSES)
+    return ''.join(flag for flag in KEYSPACE_EVENTS if flag not in enabled)
+
 
-    while t1_x < t1_len:
-        t1_miss.append(t1[t1_x])
-        t1_x += 1
+def connect(db_name):
+    db = SonicV2Connector(host='127.0.0.1')
+    db.connect(getattr(db, db_name))
+    return db, BulkReader(db)
 
-    while t2_x < t2_len:
-        t2_miss.append(t2[t2_x])
-        t2_x += 1
-    return t1_miss, t2_miss
+
+def route_key_to_prefix(key):
+    return key[len(ROUTE_TABLE_PREFIX):]
+
+
+def asic_key_to_dest(key):
+    """
+        Extract the destination prefix from an ASIC_DB route entry key, e.g.
+        ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:{"dest":"10.0.0.0/24",...}
+        without decoding the JSON object.
+    """
+    start = key.find(ASIC_DEST_FIELD)
+    if start == -1:
+        return None
+    start += len(ASIC_DEST_FIELD)
+    return key[start:key.find('"', start)]
 
 
 def get_routes():
-    db = ConfigDBConnector()
-    db.db_connect('APPL_DB')
+    db, reader = connect('APPL_DB')
     print_message(MODE_DEBUG, "APPL DB connected for routes")
-    keys = db.get_keys('ROUTE_TABLE')
+    keys = reader.scan_keys(db.APPL_DB, ROUTE_TABLE_PREFIX + '*')
     print_message(MODE_DEBUG, json.dumps({"ROUTE_TABLE": keys}, indent=4))
 
+    nexthops = reader.hmget_bulk(db.APPL_DB, keys, ['nexthop'])
     valid_rt = []
     skip_rt = []
     for k in keys:
-        if db.get_entry('ROUTE_TABLE', k)['nexthop'] != '':
-            valid_rt.append(add_prefix_ifnot(k))
+        prefix = route_key_to_prefix(k)
+        if nexthops[k][0]:
+            valid_rt.append(add_prefix_ifnot(prefix))
         else:
-            skip_rt.append(k)
+            skip_rt.append(prefix)
 
     print_message(MODE_INFO, json.dumps({"skipped_routes" : skip_rt}, indent=4))
-    return sorted(valid_rt)
+    return valid_rt
 
 def get_route_entries():
-    db = ConfigDBConnector()
-    db.db_connect('ASIC_DB')
+    db, reader = connect('ASIC_DB')
     print_message(MODE_DEBUG, "ASIC DB connected")
-    keys = db.get_keys('ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY', False)
+    keys = reader.scan_keys(db.ASIC_DB, ASIC_ROUTE_ENTRY_PREFIX + '*')
     print_message(MODE_DEBUG, json.dumps({"ASIC_ROUTE_ENTRY": keys}, indent=4))
 
     rt = []
     for k in keys:
-        rt.append(k.split("\"", -1)[3])
-    return sorted(rt)
-
+        dest = asic_key_to_dest(k)
+        if dest is not None:
+            rt.append(dest)
+    return rt
+
+
+def intf_key_to_ips(key):
+    """
+        Return the route entries expected in ASIC_DB for an INTF_TABLE key:
+        the interface subnet, unless it is a loopback, and the host address.
+    """
+    subk = key[len(INTF_TABLE_PREFIX):].split(':', -1)
+    alias = subk[0]
+    if (alias == "eth0") or (alias == "docker0") or len(subk) < 2:
+        return []
+    ip_prefix = ":".join(subk[1:])
+    ip = add_prefix(ip_prefix.split("/", -1)[0])
+    if (alias != "lo"):
+        return [ip_subnet(ip_prefix), ip]
+    return [ip]
 
 def get_interfaces():
-    db = ConfigDBConnector()
-    db.db_connect('APPL_DB')
+    db, reader = connect('APPL_DB')
     print_message(MODE_DEBUG, "APPL DB connected for interfaces")
 
     intf = []
-    keys = db.get_keys('INTF_TABLE')
+    keys = reader.scan_keys(db.APPL_DB, INTF_TABLE_PREFIX + '*')
     print_message(MODE_DEBUG, json.dumps({"APPL_DB_INTF": keys}, indent=4))
 
     for k in keys:
-        subk = k.split(':', -1)
-        alias = subk[0]
-        ip_prefix = ":".join(subk[1:])
-        ip = add_prefix(ip_prefix.split("/", -1)[0])
-        if (subk[0] == "eth0") or (subk[0] == "docker0"):
-            continue
-        if (subk[0] != "lo"):
-            intf.append(ip_subnet(ip_prefix))
-        intf.append(ip)
-    return sorted(intf)
+        intf.extend(intf_key_to_ips(k))
+    return intf
 
 def check_routes():
     intf_miss = []
@@ -154,15 +198,15 @@ def check_routes():
     intf_miss, re_miss = do_diff(get_interfaces(), re_miss)
 
     if (len(rt_miss) != 0):
-        results["missed_ROUTE_TABLE_routes"] = rt_miss
+        results[MISSED_ROUTES] = rt_miss
         err_present = True
 
     if (len(intf_miss) != 0):
-        results["missed_INTF_TABLE_entries"] = intf_miss
+        results[MISSED_INTF] = intf_miss
         err_present = True
 
     if (len(re_miss) != 0):
-        results["Unaccounted_ROUTE_ENTRY_TABLE_entries"] = re_miss
+        results[UNACCOUNTED_ENTRIES] = re_miss
         err_present = True
 
     if err_present:
@@ -173,20 +217,304 @@ def check_routes():
         print_message(MODE_ERR, "All good!")
         return 0
 
+
+class RouteMonitor(object):
+    """
+        Daemon mode of the route check.
+
+        After one full sync the route, ASIC route entry and interface sets
+        are kept up to date from APPL_DB and ASIC_DB keyspace notifications,
+        re-reading only the keys that changed. The mismatches of a prefix
+        are re-evaluated whenever one of its keys changes, and reported
+        once they have persisted for the grace period.
+
+        As notifications are not delivered again once lost, the sets are
+        rebuilt with a full sync every resync period and after a lost
+        redis connection.
+    """
+    def __init__(self, grace=DEFAULT_GRACE):
+        self.appl_db, self.appl_reader = connect('APPL_DB')
+        self.asic_db, self.asic_reader = connect('ASIC_DB')
+        self.grace = grace
+        self.routes = set()
+        # ASIC route entry keys by destination prefix
+        self.entries = {}
+        # INTF_TABLE keys by expected prefix, and expected prefixes by key
+        self.intf = {}
+        self.intf_keys = {}
+        # First time each mismatch of a prefix was seen, by prefix and category
+        self.pending = {}
+        self.reported = set()
+        self.resolved = []
+        # notify-keyspace-events values to restore on exit, by redis client
+        self.keyspace_events = {}
+
+    def subscribe(self, db, db_name, patterns):
+        """
+            Subscribe to the keyspace notifications of the keys matching
+            patterns. Returns the pubsub and the length of the channel
+            prefix in front of the key.
+        """
+        client = db.get_redis_client(getattr(db, db_name))
+        self.enable_keyspace_events(client)
+        channel_prefix = '__keyspace@%d__:' % client.connection_pool.connection_kwargs['db']
+        pubsub = client.pubsub()
+        pubsub.psubscribe(*[channel_prefix + pattern for pattern in patterns])
+        return pubsub, len(channel_prefix)
+
+    def enable_keyspace_events(self, client):
+        """
+            Add the keyspace notification flags the daemon needs to the
+            ones already enabled on the redis server, leaving the others
+            as they are.
+        """
+        try:
+            events = client.config_get(NOTIFY_KEYSPACE_EVENTS).get(NOTIFY_KEYSPACE_EVENTS, '')
+            missing = missing_keyspace_events(events)
+            if not missing:
+                return
+            client.config_set(NOTIFY_KEYSPACE_EVENTS, events + missing)
+            enabled = client.config_get(NOTIFY_KEYSPACE_EVENTS).get(NOTIFY_KEYSPACE_EVENTS, '')
+        except redis.exceptions.ResponseError as e:
+            print_message(MODE_ERR, "Can not enable keyspace notifications: %s" % e,
+                          "Set '%s' to include '%s' to run the route check daemon" % (NOTIFY_KEYSPACE_EVENTS, KEYSPACE_EVENTS))
+            sys.exit(-1)
+        # Restore the value found before the first change
+        if client not in self.keyspace_events:
+            self.keyspace_events[client] = (events, enabled)
+        print_message(MODE_INFO, "Enabled keyspace notifications '%s'" % missing)
+
+    def restore_keyspace_events(self):
+        """
+            Restore the notify-keyspace-events values changed by
+            enable_keyspace_events(), unless someone changed them since.
+        """
+        for client, (events, enabled) in self.keyspace_events.items():
+            try:
+                if client.config_get(NOTIFY_KEYSPACE_EVENTS).get(NOTIFY_KEYSPACE_EVENTS) == enabled:
+                    client.config_set(NOTIFY_KEYSPACE_EVENTS, events)
+            except redis.exceptions.RedisError as e:
+                print_message(MODE_ERR, "Can not restore %s: %s" % (NOTIFY_KEYSPACE_EVENTS, e))
+        self.keyspace_events = {}
+
+    def mismatches(self, prefix):
+        """
+            Categories the prefix is reported under, following the same
+            rules as check_routes().
+        """
+        in_routes = prefix in self.routes
+        in_entries = bool(self.entries.get(prefix))
+        categories = []
+        if in_routes and not in_entries:
+            categories.append(MISSED_ROUTES)
+        if self.intf.get(prefix):
+            if in_routes or not in_entries:
+                categories.append(MISSED_INTF)
+        elif in_entries and not in_routes:
+            categories.append(UNACCOUNTED_ENTRIES)
+        return categories
+
+    def update(self, prefixes, now):
+        for prefix in prefixes:
+            old = self.pending.pop(prefix, {})
+            new = dict((category, old.get(category, now)) for category in self.mismatches(prefix))
+            if new:
+                self.pending[prefix] = new
+            for category in old:
+                if category not in new and (category, prefix) in self.reported:
+                    self.reported.discard((category, prefix))
+                    self.resolved.append(prefix)
+
+    def set_route(self, key, nexthop):
+        prefix = add_prefix_ifnot(route_key_to_prefix(key))
+        if nexthop:
+            self.routes.add(prefix)
+        else:
+            self.routes.discard(prefix)
+        return [prefix]
+
+    def set_entry(self, key, exists):
+        prefix = asic_key_to_dest(key)
+        if prefix is None:
+            return []
+        keys = self.entries.setdefault(prefix, set())
+        if exists:
+            keys.add(key)
+        else:
+            keys.discard(key)
+            if not keys:
+                del self.entries[prefix]
+        return [prefix]
+
+    def set_intf(self, key, exists):
+        prefixes = self.intf_keys.pop(key, [])
+        for prefix in prefixes:
+            self.intf[prefix] -= 1
+            if not self.intf[prefix]:
+                del self.intf[prefix]
+        if exists:
+            self.intf_keys[key] = intf_key_to_ips(key)
+            for prefix in self.intf_keys[key]:
+                self.intf[prefix] = self.intf.get(prefix, 0) + 1
+            prefixes = prefixes + self.intf_keys[key]
+        return prefixes
+
+    def exists_bulk(self, reader, db_name, keys):
+        replies = reader.pipelined(db_name, keys, lambda pipe, key: pipe.exists(key))
+        return dict(zip(keys, replies))
+
+    def read_appl(self, keys):
+        """
+            Re-read the given APPL_DB keys and return the affected prefixes.
+        """
+        route_keys = [k for k in keys if k.startswith(ROUTE_TABLE_PREFIX)]
+        intf_keys = [k for k in keys if k.startswith(INTF_TABLE_PREFIX)]
+        nexthops = self.appl_reader.hmget_bulk(self.appl_db.APPL_DB, route_keys, ['nexthop'])
+        exists = self.exists_bulk(self.appl_reader, self.appl_db.APPL_DB, intf_keys)
+
+        prefixes = []
+        for key in route_keys:
+            prefixes.extend(self.set_route(key, nexthops[key][0]))
+        for key in intf_keys:
+            prefixes.extend(self.set_intf(key, exists[key]))
+        return prefixes
+
+    def read_asic(self, keys):
+        """
+            Re-read the given ASIC_DB keys and return the affected prefixes.
+        """
+        exists = self.exists_bulk(self.asic_reader, self.asic_db.ASIC_DB, keys)
+        prefixes = []
+        for key in keys:
+            prefixes.extend(self.set_entry(key, exists[key]))
+        return prefixes
+
+    def sync(self):
+        """
+            Rebuild the sets from a full read of the tables. Mismatches
+            still present keep the time they were first seen.
+        """
+        self.routes = set()
+        self.entries = {}
+        self.intf = {}
+        self.intf_keys = {}
+
+        appl_keys = self.appl_reader.scan_keys(self.appl_db.APPL_DB, ROUTE_TABLE_PREFIX + '*')
+        appl_keys += self.appl_reader.scan_keys(self.appl_db.APPL_DB, INTF_TABLE_PREFIX + '*')
+        asic_keys = self.asic_reader.scan_keys(self.asic_db.ASIC_DB, ASIC_ROUTE_ENTRY_PREFIX + '*')
+        prefixes = self.read_appl(appl_keys) + self.read_asic(asic_keys)
+        self.update(set(prefixes) | set(self.pending), time.time())
+        print_message(MODE_INFO, "Synced %d routes, %d route entries, %d interface entries" %
+                      (len(self.routes), len(self.entries), len(self.intf)))
+
+    def report(self, now):
+        results = {}
+        for prefix, categories in self.pending.items():
+            for category, since in categories.items():
+                if now - since >= self.grace and (category, prefix) not in self.reported:
+                    self.reported.add((category, prefix))
+                    results.setdefault(category, []).append(prefix)
+
+        if results:
+            for category in results:
+                results[category].sort()
+            print_message(MODE_ERR, "results: {",  json.dumps(results, indent=4), "}")
+        if self.resolved:
+            print_message(MODE_ERR, json.dumps({"resolved": sorted(set(self.resolved))}, indent=4))
+            self.resolved = []
+        sys.stdout.flush()
+
+    def follow(self, interval, resync):
+        # Subscribe before the sync so no change in between is lost;
+        # re-reading a key that is already up to date is harmless
+        appl_pubsub, appl_skip = self.subscribe(self.appl_db, 'APPL_DB',
+                                                [ROUTE_TABLE_PREFIX + '*', INTF_TABLE_PREFIX + '*'])
+        asic_pubsub, asic_skip = self.subscribe(self.asic_db, 'ASIC_DB', [ASIC_ROUTE_ENTRY_PREFIX + '*'])
+        try:
+            self.sync()
+            next_report = time.time()
+            next_sync = next_report + resync
+            while True:
+                prefixes = self.read_appl(drain(appl_pubsub, appl_skip))
+                prefixes += self.read_asic(drain(asic_pubsub, asic_skip))
+                now = time.time()
+                self.update(set(prefixes), now)
+                if now >= next_sync:
+                    self.sync()
+                    next_sync = now + resync
+                if now >= next_report:
+                    self.report(now)
+                    next_report = now + interval
+        finally:
+            appl_pubsub.close()
+            asic_pubsub.close()
+
+    def run(self, interval=DEFAULT_INTERVAL, resync=DEFAULT_RESYNC):
+        try:
+            while True:
+                try:
+                    self.follow(interval, resync)
+                except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+                    print_message(MODE_ERR, "Lost redis connection: %s, resyncing" % e)
+                    time.sleep(RECONNECT_DELAY)
+        finally:
+            self.restore_keyspace_events()
+
+
+def drain(pubsub, skip):
+    """
+        Return the keys of the pending keyspace notifications, waiting
+        up to POLL_TIMEOUT for the first one.
+    """
+    keys = set()
+    timeout = POLL_TIMEOUT
+    while len(keys) < BATCH_SIZE:
+        message = pubsub.get_message(timeout=timeout)
+        if message is None:
+            break
+        timeout = 0
+        if message['type'] == 'pmessage':
+            keys.add(message['channel'][skip:])
+    return list(keys)
+
 def usage():
-    print sys.argv[0], "[-m <QUIET|ERR|INFO|DEBUG>]"
-    print sys.argv[0], "[--mode=<QUIET|ERR|INFO|DEBUG>]"
+    print sys.argv[0], "[-m <QUIET|ERR|INFO|DEBUG>] [-d [-i <interval>] [-g <grace>] [-r <resync>]]"
+    print sys.argv[0], "[--mode=<QUIET|ERR|INFO|DEBUG>] [--daemon [--interval=<seconds>] [--grace=<seconds>] [--resync=<seconds>]]"
     sys.exit(-1)
 
 def main(argv):
     try:
-        opts, argv = getopt.getopt(argv, "m:", ["mode="])
+        opts, argv = getopt.getopt(argv, "m:di:g:r:", ["mode=", "daemon", "interval=", "grace=", "resync="])
     except getopt.GetoptError:
         usage()
 
+    daemon = False
+    interval = DEFAULT_INTERVAL
+    grace = DEFAULT_GRACE
+    resync = DEFAULT_RESYNC
     for opt, arg in opts:
         if opt in ("-m", "--mode"):
             set_mode(arg)
+        elif opt in ("-d", "--daemon"):
+            daemon = True
+        elif opt in ("-i", "--interval", "-g", "--grace", "-r", "--resync"):
+            try:
+                value = float(arg)
+            except ValueError:
+                usage()
+            if opt in ("-i", "--interval"):
+                interval = value
+            elif opt in ("-g", "--grace"):
+                grace = value
+            else:
+                resync = value
+
+    if daemon:
+        try:
+            RouteMonitor(grace).run(interval, resync)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
 
     ret = check_routes()
     sys.exit(ret)
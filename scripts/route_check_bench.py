@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#####################################################################
+#
+# route_check_bench.py measures route_check.py against synthetic
+# APPL_DB ROUTE_TABLE and ASIC_DB route entry tables of a given size.
+#
+# It runs against the unit test mock DB by default. To measure real
+# redis, start a scratch redis server and give its unix socket with
+# --redis-socket; never point it at the redis of a running switch. The
+# generated keys are removed again unless --keep is given.
+#
+# This is a developer tool, run it from the source tree: it is not
+# installed.
+#
+#####################################################################
+
+import argparse
+import os
+import sys
+import time
+
+from swsssdk import SonicV2Connector
+
+SWITCH_ID = 'oid:0x21000000000000'
+VR_ID = 'oid:0x3000000000022'
+NEXT_HOP_ID = 'oid:0x5000000000614'
+BATCH_SIZE = 1000
+
+
+def use_mock_db():
+    """
+        Serve every connection to the same database from one shared mock
+        redis, so that the generated tables are seen by route_check.
+    """
+    modules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    tests_path = os.path.join(modules_path, "sonic-utilities-tests")
+    sys.path.insert(0, modules_path)
+    sys.path.insert(0, tests_path)
+    import mock_tables.dbconnector as mock_db
+
+    clients = {}
+
+    def shared_client(*args, **kwargs):
+        db = kwargs['db']
+        if db not in clients:
+            clients[db] = mock_db.SwssSyncClient(*args, **kwargs)
+        return clients[db]
+
+    mock_db.redis.StrictRedis = shared_client
+
+
+def gen_prefixes(count):
+    """
+        Yield count distinct prefixes, one IPv6 /64 for every three IPv4 /24.
+    """
+    for i in range(count):
+        if i % 4 == 3:
+            yield '20c0:%x:%x::/64' % (i >> 16, i & 0xffff)
+        else:
+            yield '%d.%d.%d.0/24' % (100 + (i >> 16), (i >> 8) & 0xff, i & 0xff)
+
+
+def asic_route_key(prefix):
+    return 'ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:{"dest":"%s","switch_id":"%s","vr":"%s"}' % (prefix, SWITCH_ID, VR_ID)
+
+
+def write_batched(client, keys, fields):
+    for start in range(0, len(keys), BATCH_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for key in keys[start:start + BATCH_SIZE]:
+            pipe.hmset(key, fields)
+        pipe.execute()
+
+
+def delete_batched(client, keys):
+    for start in range(0, len(keys), BATCH_SIZE):
+        client.delete(*keys[start:start + BATCH_SIZE])
+
+
+def gen_keys(count, missing):
+    """
+        Return the APPL_DB and ASIC_DB keys of count routes, leaving out the
+        last 'missing' routes of each table so route_check has mismatches
+        to report.
+    """
+    prefixes = list(gen_prefixes(count + missing))
+    appl_keys = ['ROUTE_TABLE:' + p for p in prefixes[:count]]
+    asic_keys = [asic_route_key(p) for p in prefixes[:count - missing] + prefixes[count:]]
+    return appl_keys, asic_keys
+
+
+def generate(appl, asic, appl_keys, asic_keys):
+    write_batched(appl, appl_keys, {'nexthop': '10.0.0.1', 'ifname': 'PortChannel0001'})
+    write_batched(asic, asic_keys, {'SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID': NEXT_HOP_ID})
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return result, time.time() - start
+
+
+def run(route_check):
+    routes, t_routes = timed(route_check.get_routes)
+    entries, t_entries = timed(route_check.get_route_entries)
+    interfaces, t_interfaces = timed(route_check.get_interfaces)
+
+    def diff():
+        rt_miss, re_miss = route_check.do_diff(routes, entries)
+        intf_miss, re_miss = route_check.do_diff(interfaces, re_miss)
+        return rt_miss, intf_miss, re_miss
+    (rt_miss, intf_miss, re_miss), t_diff = timed(diff)
+
+    print "ROUTE_TABLE routes:      %8d  %.3f seconds" % (len(routes), t_routes)
+    print "ASIC_DB route entries:   %8d  %.3f seconds" % (len(entries), t_entries)
+    print "INTF_TABLE entries:      %8d  %.3f seconds" % (len(interfaces), t_interfaces)
+    print "diff:                              %.3f seconds" % t_diff
+    print "total:                             %.3f seconds" % (t_routes + t_entries + t_interfaces + t_diff)
+    print "missed routes: %d, missed interfaces: %d, unaccounted entries: %d" % (
+        len(rt_miss), len(intf_miss), len(re_miss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark route_check.py on synthetic route tables',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-n', '--routes', type=int, default=100000, help='Number of routes to generate')
+    parser.add_argument('--missing', type=int, default=0,
+                        help='Number of routes to leave out of each table')
+    parser.add_argument('--redis-socket', metavar='PATH',
+                        help='Unix socket of a scratch redis server to use instead of the unit test mock DB')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated tables')
+    args = parser.parse_args()
+
+    if args.missing > args.routes:
+        parser.error('--missing cannot exceed --routes')
+
+    if args.redis_socket is None:
+        use_mock_db()
+        db = SonicV2Connector(host='127.0.0.1')
+    else:
+        db = SonicV2Connector(unix_socket_path=args.redis_socket)
+
+    # route_check.py is next to this script in the source tree
+    import route_check
+    route_check.set_mode('QUIET')
+
+    db.connect(db.APPL_DB)
+    db.connect(db.ASIC_DB)
+    appl = db.get_redis_client(db.APPL_DB)
+    asic = db.get_redis_client(db.ASIC_DB)
+
+    appl_keys, asic_keys = gen_keys(args.routes, args.missing)
+    try:
+        _, t_gen = timed(lambda: generate(appl, asic, appl_keys, asic_keys))
+        print "Generated %d routes in %.3f seconds" % (args.routes, t_gen)
+
+        run(route_check)
+    finally:
+        if not args.keep:
+            delete_batched(appl, appl_keys)
+            delete_batched(asic, asic_keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,19 @@ try:
     import os
     import subprocess
     import click
+    import errno
     import imp
+    import json
+    import re
+    import stat
     import syslog
+    import tempfile
     import types
     import traceback
+    from collections import OrderedDict
+    from multiprocessing.pool import ThreadPool
+    from sonic_sfp.sff8436 import sff8436InterfaceId, sff8436Dom
+    from sonic_sfp.sff8472 import sff8472InterfaceId, sff8472Dom
     from tabulate import tabulate
 except ImportError as e:
     raise ImportError("%s - required module not found" % str(e))
@@ -30,6 +39,24 @@ SONIC_CFGGEN_PATH = '/usr/local/bin/sonic-cfggen'
 HWSKU_KEY = 'DEVICE_METADATA.localhost.hwsku'
 PLATFORM_KEY = 'DEVICE_METADATA.localhost.platform'
 
+# The cache directory is only readable and writable by root, as the cached
+# EEPROM data is trusted
+DEFAULT_EEPROM_CACHE_DIR = '/var/cache/sfputil'
+EEPROM_CACHE_FILE = 'eeprom.json'
+EEPROM_CACHE_VERSION = 1
+
+# Vendor serial number in the SFF-8472 A0h page and in the SFF-8436 upper page 00h
+SFP_VENDOR_SN_OFFSET = 68
+QSFP_VENDOR_SN_OFFSET = 196
+VENDOR_SN_WIDTH = 16
+
+# The SFF-8436 lower page holds the live monitoring data, the upper page 00h is static
+QSFP_LOWER_PAGE_SIZE = 128
+
+# Matches the bus number in the sysfs path of an I2C device, like
+# /sys/bus/i2c/devices/i2c-11/11-0050/eeprom
+I2C_DEVICE_RE = re.compile(r'/(\d+)-00[0-9a-f]{2}/')
+
 # Global platform-specific sfputil class instance
 platform_sfputil = None
 
@@ -170,7 +197,8 @@ def print_all_valid_port_values():
 
 
 # Returns multi-line string of pretty SFP port EEPROM data
-def port_eeprom_data_string_pretty(logical_port_name, dump_dom):
+# port_data is the EEPROM data of the physical ports, see read_ports_eeprom()
+def port_eeprom_data_string_pretty(logical_port_name, dump_dom, port_data):
     result = ""
     ganged = False
     i = 1
@@ -185,10 +213,7 @@ def port_eeprom_data_string_pretty(logical_port_name, dump_dom):
 
     for physical_port in physical_port_list:
         port_name = get_physical_port_name(logical_port_name, i, ganged)
-        if not platform_sfputil.get_presence(physical_port):
-            eeprom_dict = None
-        else:
-            eeprom_dict = platform_sfputil.get_eeprom_dict(physical_port)
+        eeprom_dict = port_data.get(physical_port)
 
         if eeprom_dict is not None:
             eeprom_iface_dict = eeprom_dict.get('interface')
@@ -210,7 +235,7 @@ def port_eeprom_data_string_pretty(logical_port_name, dump_dom):
         result += "\n"
         i += 1
 
-        return result
+    return result
 
 
 # Returns single-line string of pretty SFP port EEPROM data
@@ -218,7 +243,8 @@ def port_eeprom_data_string_pretty(logical_port_name, dump_dom):
 def port_eeprom_data_string_pretty_oneline(logical_port_name,
                                            ifdata_blacklist,
                                            domdata_blacklist,
-                                           dump_dom):
+                                           dump_dom,
+                                           port_data):
     result = ""
     ganged = False
     i = 1
@@ -232,10 +258,7 @@ def port_eeprom_data_string_pretty_oneline(logical_port_name,
         ganged = True
 
     for physical_port in physical_port_list:
-        if not platform_sfputil.get_presence(physical_port):
-            eeprom_dict = None
-        else:
-            eeprom_dict = platform_sfputil.get_eeprom_dict(physical_port)
+        eeprom_dict = port_data.get(physical_port)
 
         # Only print detected sfp ports for oneline
         if eeprom_dict is not None:
@@ -258,7 +281,7 @@ def port_eeprom_data_string_pretty_oneline(logical_port_name,
     return result
 
 
-def port_eeprom_data_raw_string_pretty(logical_port_name):
+def port_eeprom_data_raw_string_pretty(logical_port_name, port_data):
     result = ""
     ganged = False
     i = 1
@@ -273,10 +296,7 @@ def port_eeprom_data_raw_string_pretty(logical_port_name):
 
     for physical_port in physical_port_list:
         port_name = get_physical_port_name(logical_port_name, i, ganged)
-        if not platform_sfputil.get_presence(physical_port):
-            eeprom_raw = None
-        else:
-            eeprom_raw = platform_sfputil.get_eeprom_raw(physical_port)
+        eeprom_raw = port_data.get(physical_port)
 
         if eeprom_raw is None:
             result += get_sfp_eeprom_status_string(port_name, False)
@@ -292,6 +312,232 @@ def port_eeprom_data_raw_string_pretty(logical_port_name):
     return result
 
 
+# ==================== Reading SFP EEPROM data ====================
+
+
+# Reads num_bytes of the EEPROM of a physical port at offset, straight from
+# its sysfs file. Returns a list of hex strings like get_eeprom_raw()
+def read_eeprom_bytes(physical_port, offset, num_bytes):
+    with open(platform_sfputil.port_to_eeprom_mapping[physical_port], 'rb') as f:
+        f.seek(offset)
+        raw = f.read(num_bytes)
+
+    if len(raw) != num_bytes:
+        raise IOError("Short EEPROM read on port %d" % physical_port)
+
+    return ['%02x' % ord(byte) for byte in raw]
+
+
+def read_vendor_serial(physical_port):
+    if physical_port in platform_sfputil.qsfp_ports:
+        offset = QSFP_VENDOR_SN_OFFSET
+    else:
+        offset = SFP_VENDOR_SN_OFFSET
+
+    return ''.join(read_eeprom_bytes(physical_port, offset, VENDOR_SN_WIDTH))
+
+
+# Returns the I2C bus of a physical port, None if it is not known
+def get_port_i2c_bus(physical_port):
+    try:
+        eeprom_path = platform_sfputil.port_to_eeprom_mapping[physical_port]
+    except (AttributeError, KeyError, NotImplementedError):
+        return None
+
+    match = I2C_DEVICE_RE.search(eeprom_path)
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
+class EepromCache(object):
+    """
+        On-disk cache of the static EEPROM page of the transceivers, keyed
+        by physical port and vendor serial number.
+
+        The serial number is read on every access; as long as it matches
+        the cached one, the cached page is used. Only the live data is
+        re-read: the SFF-8436 lower page of QSFPs, and the A2h page of
+        SFPs when DOM data is decoded. Ports whose EEPROM file cannot be
+        read directly are read through the platform plugin and not cached.
+
+        The cache is only used if its directory is private to the current
+        user; it is created with mode 0700 if it does not exist.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, EEPROM_CACHE_FILE)
+        self.ports = {}
+        self.changed = False
+        self.enabled = self.open_dir()
+
+        if not self.enabled:
+            log_warning("EEPROM cache directory '%s' is not private, not using the cache" % cache_dir, True)
+        elif os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get('version') == EEPROM_CACHE_VERSION:
+                    self.ports = data['ports']
+            except (IOError, ValueError, KeyError):
+                pass
+
+    def open_dir(self):
+        try:
+            os.makedirs(self.cache_dir, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return False
+
+        dir_stat = os.lstat(self.cache_dir)
+        return (stat.S_ISDIR(dir_stat.st_mode) and dir_stat.st_uid == os.geteuid() and
+                not dir_stat.st_mode & (stat.S_IRWXG | stat.S_IRWXO))
+
+    def save(self):
+        if not self.enabled or not self.changed:
+            return
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=EEPROM_CACHE_FILE + '.', dir=self.cache_dir)
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': EEPROM_CACHE_VERSION, 'ports': self.ports}, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get_eeprom_raw(self, physical_port):
+        """
+            Return the EEPROM page of a physical port like get_eeprom_raw()
+        """
+        if not self.enabled:
+            return platform_sfputil.get_eeprom_raw(physical_port)
+
+        try:
+            serial = read_vendor_serial(physical_port)
+        except (IOError, OSError, AttributeError, KeyError, NotImplementedError):
+            serial = None
+
+        entry = self.ports.get(str(physical_port))
+        if serial is not None and entry is not None and entry['serial'] == serial:
+            if physical_port not in platform_sfputil.qsfp_ports:
+                return list(entry['eeprom'])
+            try:
+                return (read_eeprom_bytes(physical_port, 0, QSFP_LOWER_PAGE_SIZE) +
+                        entry['eeprom'][QSFP_LOWER_PAGE_SIZE:])
+            except (IOError, OSError):
+                pass
+
+        eeprom_raw = platform_sfputil.get_eeprom_raw(physical_port)
+        if serial is not None and eeprom_raw is not None:
+            self.ports[str(physical_port)] = {'serial': serial, 'eeprom': eeprom_raw}
+            self.changed = True
+
+        return eeprom_raw
+
+
+# Decodes the EEPROM page of a physical port into the same dictionary as
+# get_eeprom_dict(). The A2h page of SFPs is only read with dump_dom,
+# through get_eeprom_dict() if the plugin has no get_eeprom_dom_raw()
+def decode_eeprom(physical_port, eeprom_raw, dump_dom):
+    eeprom_dict = {}
+
+    if physical_port in platform_sfputil.qsfp_ports:
+        eeprom_dict['interface'] = sff8436InterfaceId(eeprom_raw).get_data_pretty()
+        if dump_dom:
+            eeprom_dict['dom'] = sff8436Dom(eeprom_raw).get_data_pretty()
+    elif dump_dom and not hasattr(platform_sfputil, 'get_eeprom_dom_raw'):
+        # The A2h page can only be read as part of the whole EEPROM
+        return platform_sfputil.get_eeprom_dict(physical_port)
+    else:
+        sfpi_obj = sff8472InterfaceId(eeprom_raw)
+        eeprom_dict['interface'] = sfpi_obj.get_data_pretty()
+        if dump_dom:
+            eeprom_domraw = platform_sfputil.get_eeprom_dom_raw(physical_port)
+            if eeprom_domraw is not None:
+                sfpd_obj = sff8472Dom(eeprom_domraw, sfpi_obj.get_calibration_type())
+                eeprom_dict['dom'] = sfpd_obj.get_data_pretty()
+
+    return eeprom_dict
+
+
+# Returns the EEPROM data of a physical port, None if no SFP is detected:
+# the raw EEPROM page with raw, the get_eeprom_dict() data otherwise
+def read_port_eeprom(physical_port, raw, dump_dom, cache=None):
+    if not platform_sfputil.get_presence(physical_port):
+        return None
+
+    if cache is None:
+        if raw:
+            return platform_sfputil.get_eeprom_raw(physical_port)
+        return platform_sfputil.get_eeprom_dict(physical_port)
+
+    eeprom_raw = cache.get_eeprom_raw(physical_port)
+    if raw or eeprom_raw is None:
+        return eeprom_raw
+
+    return decode_eeprom(physical_port, eeprom_raw, dump_dom)
+
+
+# Returns the EEPROM data of each physical port, see read_port_eeprom().
+# Up to jobs ports are read at a time, but only one port at a time per
+# I2C bus, as the reads of a bus are serialized anyway
+def read_ports_eeprom(physical_ports, raw, dump_dom, cache=None, jobs=1):
+    groups = OrderedDict()
+    for physical_port in physical_ports:
+        bus = get_port_i2c_bus(physical_port)
+        group = ('bus', bus) if bus is not None else ('port', physical_port)
+        groups.setdefault(group, []).append(physical_port)
+
+    def read_group(group_ports):
+        return [(physical_port, read_port_eeprom(physical_port, raw, dump_dom, cache))
+                for physical_port in group_ports]
+
+    if jobs <= 1 or len(groups) <= 1:
+        results = [read_group(group_ports) for group_ports in groups.values()]
+    else:
+        pool = ThreadPool(min(jobs, len(groups)))
+        try:
+            results = pool.map(read_group, groups.values())
+        finally:
+            pool.close()
+
+    return dict(item for group_results in results for item in group_results)
+
+
+# Writes the raw EEPROM page of each port, the same bytes as printed by
+# --raw, as a JSON object of port name to presence and hex string
+def export_eeprom_raw(logical_port_list, port_data, filename):
+    export = OrderedDict()
+
+    for logical_port_name in logical_port_list:
+        physical_port_list = logical_port_name_to_physical_port_list(logical_port_name)
+        if physical_port_list is None:
+            continue
+
+        ganged = len(physical_port_list) > 1
+        for i, physical_port in enumerate(physical_port_list, 1):
+            port_name = get_physical_port_name(logical_port_name, i, ganged)
+            eeprom_raw = port_data.get(physical_port)
+            if eeprom_raw is None:
+                export[port_name] = OrderedDict([('present', False)])
+            else:
+                export[port_name] = OrderedDict([('present', True), ('eeprom', ''.join(eeprom_raw))])
+
+    with open(filename, 'w') as f:
+        json.dump(export, f, indent=4, separators=(',', ': '))
+        f.write('\n')
+
+    return len(export)
+
+
 # ==================== Methods for initialization ====================
 
 
@@ -404,11 +650,22 @@ def show():
 @click.option('-d', '--dom', 'dump_dom', is_flag=True, help="Also display Digital Optical Monitoring (DOM) data")
 @click.option('-o', '--oneline', is_flag=True, help="Condense output for each port to a single line")
 @click.option('--raw', is_flag=True, help="Output raw, unformatted data")
-def eeprom(port, dump_dom, oneline, raw):
+@click.option('-e', '--export', metavar='<filename>', type=click.Path(dir_okay=False),
+              help="Write the raw EEPROM data of the port(s) to <filename> as JSON")
+@click.option('-j', '--jobs', default=1, type=int,
+              help="Number of ports to read at a time, at most one per I2C bus (default 1)")
+@click.option('-c', '--cache', 'use_cache', is_flag=True,
+              help="Reuse the static EEPROM data of transceivers cached in %s" % DEFAULT_EEPROM_CACHE_DIR)
+def eeprom(port, dump_dom, oneline, raw, export, jobs, use_cache):
     """Display EEPROM data of SFP transceiver(s)"""
     logical_port_list = []
+    physical_port_list = []
     output = ""
 
+    if jobs < 1:
+        print "Error: jobs must be positive"
+        sys.exit(1)
+
     # Create a list containing the logical port names of all ports we're interested in
     if port is None:
         logical_port_list = platform_sfputil.logical
@@ -420,9 +677,26 @@ def eeprom(port, dump_dom, oneline, raw):
 
         logical_port_list = [port]
 
+    for logical_port_name in logical_port_list:
+        physical_port_list.extend(logical_port_name_to_physical_port_list(logical_port_name) or [])
+
+    cache = EepromCache(DEFAULT_EEPROM_CACHE_DIR) if use_cache else None
+    port_data = read_ports_eeprom(physical_port_list, raw or export is not None, dump_dom, cache, jobs)
+    if cache is not None:
+        cache.save()
+
+    if export is not None:
+        try:
+            count = export_eeprom_raw(logical_port_list, port_data, export)
+        except IOError as e:
+            print "Error: cannot write '%s': %s" % (export, e.strerror)
+            sys.exit(1)
+        print "Exported EEPROM data of %d port(s) to %s" % (count, export)
+        return
+
     if raw:
         for logical_port_name in logical_port_list:
-            output += port_eeprom_data_raw_string_pretty(logical_port_name)
+            output += port_eeprom_data_raw_string_pretty(logical_port_name, port_data)
             output += "\n"
     elif oneline:
         ifdata_out_blacklist = ["EncodingCodes",
@@ -434,10 +708,11 @@ def eeprom(port, dump_dom, oneline, raw):
             output += port_eeprom_data_string_pretty_oneline(logical_port_name,
                                                              ifdata_out_blacklist,
                                                              domdata_out_blacklist,
-                                                             dump_dom)
+                                                             dump_dom,
+                                                             port_data)
     else:
         for logical_port_name in logical_port_list:
-            output += port_eeprom_data_string_pretty(logical_port_name, dump_dom)
+            output += port_eeprom_data_string_pretty(logical_port_name, dump_dom, port_data)
 
     print output
 
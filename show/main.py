@@ -19,11 +19,21 @@ from swsssdk import ConfigDBConnector
 from swsssdk import SonicV2Connector
 
 import mlnx
+from utilities_common.intf_alias import get_alias_converter
+from utilities_common.script_runner import load_script, run_script
 
 SONIC_CFGGEN_PATH = '/usr/local/bin/sonic-cfggen'
 
 VLAN_SUB_INTERFACE_SEPARATOR = '.'
 
+# Scripts which provide main(argv) and are run inside the show process
+# instead of a shell subprocess
+IN_PROCESS_COMMANDS = ('portstat', 'intfstat', 'pfcstat', 'queuestat')
+
+# Commands which display interface names according to the naming mode
+# themselves, so their output needs no alias conversion
+ALIAS_AWARE_COMMANDS = ('intfutil',) + IN_PROCESS_COMMANDS
+
 try:
     # noinspection PyPep8Naming
     import ConfigParser as configparser
@@ -49,70 +59,6 @@ class Config(object):
         except configparser.NoSectionError:
             pass
 
-class InterfaceAliasConverter(object):
-    """Class which handles conversion between interface name and alias"""
-
-    def __init__(self):
-        self.alias_max_length = 0
-
-        config_db = ConfigDBConnector()
-        config_db.connect()
-        self.port_dict = config_db.get_table('PORT')
-
-        if not self.port_dict:
-            click.echo(message="Warning: failed to retrieve PORT table from ConfigDB!", err=True)
-            self.port_dict = {}
-
-        for port_name in self.port_dict.keys():
-            try:
-                if self.alias_max_length < len(
-                        self.port_dict[port_name]['alias']):
-                   self.alias_max_length = len(
-                        self.port_dict[port_name]['alias'])
-            except KeyError:
-                break
-
-    def name_to_alias(self, interface_name):
-        """Return vendor interface alias if SONiC
-           interface name is given as argument
-        """
-        vlan_id = ''
-        sub_intf_sep_idx = -1
-        if interface_name is not None:
-            sub_intf_sep_idx = interface_name.find(VLAN_SUB_INTERFACE_SEPARATOR)
-            if sub_intf_sep_idx != -1:
-                vlan_id = interface_name[sub_intf_sep_idx + 1:]
-                # interface_name holds the parent port name
-                interface_name = interface_name[:sub_intf_sep_idx]
-
-            for port_name in self.port_dict.keys():
-                if interface_name == port_name:
-                    return self.port_dict[port_name]['alias'] if sub_intf_sep_idx == -1 \
-                            else self.port_dict[port_name]['alias'] + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
-
-        # interface_name not in port_dict. Just return interface_name
-        return interface_name if sub_intf_sep_idx == -1 else interface_name + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
-
-    def alias_to_name(self, interface_alias):
-        """Return SONiC interface name if vendor
-           port alias is given as argument
-        """
-        vlan_id = ''
-        sub_intf_sep_idx = -1
-        if interface_alias is not None:
-            sub_intf_sep_idx = interface_alias.find(VLAN_SUB_INTERFACE_SEPARATOR)
-            if sub_intf_sep_idx != -1:
-                vlan_id = interface_alias[sub_intf_sep_idx + 1:]
-                # interface_alias holds the parent port alias
-                interface_alias = interface_alias[:sub_intf_sep_idx]
-
-            for port_name in self.port_dict.keys():
-                if interface_alias == self.port_dict[port_name]['alias']:
-                    return port_name if sub_intf_sep_idx == -1 else port_name + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
-
-        # interface_alias not in port_dict. Just return interface_alias
-        return interface_alias if sub_intf_sep_idx == -1 else interface_alias + VLAN_SUB_INTERFACE_SEPARATOR + vlan_id
-
 
 # Global Config object
 _config = None
@@ -192,12 +138,19 @@ def run_command(command, display_cmd=False):
     if display_cmd:
         click.echo(click.style("Command: ", fg='cyan') + click.style(command, fg='green'))
 
-    # No conversion needed for intfutil commands as it already displays
-    # both SONiC interface name and alias name for all interfaces.
-    if get_interface_mode() == "alias" and not command.startswith("intfutil"):
+    # No conversion needed for intfutil and the counter commands as they
+    # already display interface names according to the naming mode.
+    if get_interface_mode() == "alias" and not command.startswith(ALIAS_AWARE_COMMANDS):
         run_command_in_alias_mode(command)
         raise sys.exit(0)
 
+    argv = command.split()
+    if argv and argv[0] in IN_PROCESS_COMMANDS and load_script(argv[0]) is not None:
+        rc = run_script(argv[0], argv[1:])
+        if rc != 0:
+            sys.exit(rc)
+        return
+
     proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
 
     while True:
@@ -229,7 +182,7 @@ def is_ip_prefix_in_key(key):
 
 
 # Global class instance for SONiC interface name to alias conversion
-iface_alias_converter = InterfaceAliasConverter()
+iface_alias_converter = get_alias_converter()
 
 
 def print_output_in_alias_mode(output, index):
@@ -254,9 +207,7 @@ def print_output_in_alias_mode(output, index):
     if word:
         interface_name = word[index]
         interface_name = interface_name.replace(':', '')
-    for port_name in natsorted(iface_alias_converter.port_dict.keys()):
-            if interface_name == port_name:
-                alias_name = iface_alias_converter.port_dict[port_name]['alias']
+        alias_name = iface_alias_converter.get_alias(interface_name)
     if alias_name:
         if len(alias_name) < iface_alias_converter.alias_max_length:
             alias_name = alias_name.rjust(
@@ -283,35 +234,7 @@ def run_command_in_alias_mode(command):
             raw_output = output
             output = output.lstrip()
 
-            if command.startswith("portstat"):
-                """Show interface counters"""
-                index = 0
-                if output.startswith("IFACE"):
-                    output = output.replace("IFACE", "IFACE".rjust(
-                               iface_alias_converter.alias_max_length))
-                print_output_in_alias_mode(output, index)
-
-            elif command.startswith("intfstat"):
-                """Show RIF counters"""
-                index = 0
-                if output.startswith("IFACE"):
-                    output = output.replace("IFACE", "IFACE".rjust(
-                               iface_alias_converter.alias_max_length))
-                print_output_in_alias_mode(output, index)
-
-            elif command == "pfcstat":
-                """Show pfc counters"""
-                index = 0
-                if output.startswith("Port Tx"):
-                    output = output.replace("Port Tx", "Port Tx".rjust(
-                                iface_alias_converter.alias_max_length))
-
-                elif output.startswith("Port Rx"):
-                    output = output.replace("Port Rx", "Port Rx".rjust(
-                                iface_alias_converter.alias_max_length))
-                print_output_in_alias_mode(output, index)
-
-            elif (command.startswith("sudo sfputil show eeprom")):
+            if (command.startswith("sudo sfputil show eeprom")):
                 """show interface transceiver eeprom"""
                 index = 0
                 print_output_in_alias_mode(raw_output, index)
@@ -334,14 +257,6 @@ def run_command_in_alias_mode(command):
                                iface_alias_converter.alias_max_length))
                 print_output_in_alias_mode(output, index)
 
-            elif command.startswith("queuestat"):
-                """show queue counters"""
-                index = 0
-                if output.startswith("Port"):
-                    output = output.replace("Port", "Port".rjust(
-                               iface_alias_converter.alias_max_length))
-                print_output_in_alias_mode(output, index)
-
             elif command == "fdbshow":
                 """show mac"""
                 index = 3
@@ -721,8 +636,10 @@ def transceiver():
 @transceiver.command()
 @click.argument('interfacename', required=False)
 @click.option('-d', '--dom', 'dump_dom', is_flag=True, help="Also display Digital Optical Monitoring (DOM) data")
+@click.option('-j', '--json', 'use_json', is_flag=True, help="Display in JSON format")
+@click.option('--csv', 'use_csv', is_flag=True, help="Display in CSV format")
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
-def eeprom(interfacename, dump_dom, verbose):
+def eeprom(interfacename, dump_dom, use_json, use_csv, verbose):
     """Show interface transceiver EEPROM information"""
 
     cmd = "sfpshow eeprom"
@@ -730,6 +647,12 @@ def eeprom(interfacename, dump_dom, verbose):
     if dump_dom:
         cmd += " --dom"
 
+    if use_json:
+        cmd += " --json"
+
+    if use_csv:
+        cmd += " --csv"
+
     if interfacename is not None:
         if get_interface_mode() == "alias":
             interfacename = iface_alias_converter.alias_to_name(interfacename)
@@ -843,10 +766,15 @@ def rif(interface, period, verbose):
 
 # 'portchannel' subcommand ("show interfaces portchannel")
 @interfaces.command()
+@click.option('-s', '--state-db', is_flag=True, help="Read the team state from STATE_DB instead of teamdctl")
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
-def portchannel(verbose):
+def portchannel(state_db, verbose):
     """Show PortChannel information"""
-    cmd = "sudo teamshow"
+    # The STATE_DB mode needs no root to run teamdctl
+    if state_db:
+        cmd = "teamshow --state-db"
+    else:
+        cmd = "sudo teamshow"
     run_command(cmd, display_cmd=verbose)
 
 #
@@ -891,11 +819,14 @@ def pfc():
 
 # 'counters' subcommand ("show interfaces pfccounters")
 @pfc.command()
+@click.option('-p', '--period')
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
-def counters(verbose):
+def counters(period, verbose):
     """Show pfc counters"""
 
     cmd = "pfcstat"
+    if period is not None:
+        cmd += " -p {}".format(period)
 
     run_command(cmd, display_cmd=verbose)
 
@@ -2246,8 +2177,9 @@ def capabilities(verbose):
 @dropcounters.command()
 @click.option('-g', '--group', required=False)
 @click.option('-t', '--counter_type', required=False)
+@click.option('-j', '--json', 'use_json', is_flag=True, help="Display in JSON format")
 @click.option('--verbose', is_flag=True, help="Enable verbose output")
-def counts(group, counter_type, verbose):
+def counts(group, counter_type, use_json, verbose):
     """Show drop counts"""
     cmd = "dropstat -c show"
 
@@ -2257,6 +2189,9 @@ def counts(group, counter_type, verbose):
     if counter_type:
         cmd += " -t '{}'".format(counter_type)
 
+    if use_json:
+        cmd += " -j"
+
     run_command(cmd, display_cmd=verbose)
 
 
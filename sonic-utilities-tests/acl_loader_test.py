@@ -1,3 +1,4 @@
+import copy
 import sys
 import os
 import pytest
@@ -53,3 +54,56 @@ class TestAclLoader(object):
         # switch capability taken from mock_tables/state_db.json SWITCH_CAPABILITY table
         assert acl_loader.validate_actions("DATAACL", forward_packet_action)
         assert not acl_loader.validate_actions("DATAACL", drop_packet_action)
+
+    def test_rules_diff(self):
+        acl_loader = AclLoader()
+        acl_loader.rules_info = copy.deepcopy(acl_loader.get_rules_db_info())
+        del acl_loader.rules_info[("DATAACL", "RULE_2")]
+        acl_loader.rules_info[("DATAACL", "RULE_1")]["PRIORITY"] = "5"
+        acl_loader.rules_info[("DATAACL", "RULE_10")] = {"PRIORITY": "9990", "PACKET_ACTION": "DROP"}
+
+        diff = acl_loader.diff_rules()
+        assert diff == AclRulesDiff([("DATAACL", "RULE_10")], [("DATAACL", "RULE_1")], [("DATAACL", "RULE_2")])
+
+        # A dry run leaves Config DB as is
+        acl_loader.full_update(dry_run=True)
+        assert acl_loader.configdb.get_entry("ACL_RULE", ("DATAACL", "RULE_1"))["PRIORITY"] == "9999"
+
+        acl_loader.full_update()
+        assert acl_loader.configdb.get_entry("ACL_RULE", ("DATAACL", "RULE_1"))["PRIORITY"] == "5"
+        assert acl_loader.configdb.get_entry("ACL_RULE", ("DATAACL", "RULE_2")) == {}
+        assert acl_loader.configdb.get_entry("ACL_RULE", ("DATAACL", "RULE_10")) == {"PRIORITY": "9990", "PACKET_ACTION": "DROP"}
+        assert acl_loader.diff_rules() == AclRulesDiff([], [], [])
+
+        # Only the rules of the current table are compared
+        acl_loader.set_table_name("EVERFLOW")
+        acl_loader.rules_info = {}
+        assert acl_loader.diff_rules() == AclRulesDiff([], [], [("EVERFLOW", "RULE_6"), ("EVERFLOW", "RULE_08")])
+
+    def test_validate_actions_cached(self):
+        acl_loader = AclLoader()
+        assert acl_loader.validate_actions("DATAACL", {"PACKET_ACTION": "FORWARD"})
+        # The switch capabilities are read from state_db once
+        acl_loader.statedb = None
+        assert acl_loader.validate_actions("DATAACL", {"PACKET_ACTION": "FORWARD"})
+        assert not acl_loader.validate_actions("DATAACL", {"PACKET_ACTION": "DROP"})
+        assert acl_loader.convert_port("1024..65535") == ("1024-65535", True)
+        assert acl_loader.convert_port("22") == ("22", False)
+
+    def test_convert_rules_parallel(self):
+        acl_loader = AclLoader()
+        # ACL tables named after the ACL sets of acl1.json
+        for table_name, mock_table_name in [("SONIC_SSH_ONLY", "SSH_ONLY"),
+                                            ("SONIC_SNMP_ACL", "SNMP_ACL"),
+                                            ("SONIC_EVERFLOW", "EVERFLOW")]:
+            acl_loader.tables_db_info[table_name] = acl_loader.tables_db_info[mock_table_name]
+        acl_loader.yang_acl = AclLoader.parse_acl_json(os.path.join(test_path, 'acl_input/acl1.json'))
+        acl_loader.convert_rules()
+        rules_info = acl_loader.rules_info
+        assert ("SONIC_SSH_ONLY", "RULE_1") in rules_info
+        assert ("SONIC_SNMP_ACL", "RULE_1") in rules_info
+
+        # Converting the ACL sets in worker processes gives the same rules
+        acl_loader.rules_info = {}
+        acl_loader.convert_rules(jobs=3)
+        assert acl_loader.rules_info == rules_info
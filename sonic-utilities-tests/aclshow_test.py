@@ -1,3 +1,4 @@
+import datetime
 import sys
 import os
 from StringIO import StringIO
@@ -116,6 +117,13 @@ RULE_6        EVERFLOW        9994                0              0
 RULE_08       EVERFLOW        9992                0              0
 """
 
+# Expected output for aclshow -t EVERFLOW -w 10, after 100 packets and bytes in 10 seconds
+everflow_watch_output = '' + \
+"""RULE NAME    TABLE NAME      PRIO    PACKETS COUNT    BYTES COUNT  PACKETS RATE    BYTES RATE
+-----------  ------------  ------  ---------------  -------------  --------------  ------------
+RULE_6       EVERFLOW        9994              701            700  10.00/s         10.00 B/s
+RULE_08      EVERFLOW        9992              100            100  10.00/s         10.00 B/s"""
+
 class Aclshow():
     def __init__(self, *args, **kwargs):
         """
@@ -123,7 +131,7 @@ class Aclshow():
         before and/or after the test. By default - clear on start and exit.
         """
         self.nullify_on_start, self.nullify_on_exit = args if args else (True, True)
-        self.kwargs = kwargs
+        self.kwargs = dict({'watch': 0}, **kwargs)
         self.setUp()
         self.runTest()
         self.tearDown()
@@ -212,3 +220,17 @@ def test_all_after_clear():
     nullify_on_start, nullify_on_exit = False, True
     test = Aclshow(nullify_on_start, nullify_on_exit, all=True, clear=False, rules=None, tables=None, verbose=None)
     assert test.result.getvalue() == all_after_clear_output
+
+# aclshow -t EVERFLOW -w 10
+def test_everflow_watch():
+    frames = []
+    def watch_once(interval, fetch, render):
+        old_time, old_counters = fetch()
+        new_counters = dict((key, dict((k, str(int(v) + 100)) for k, v in value.items()) if value else value)
+                            for key, value in old_counters.items())
+        frames.append(render((old_time + datetime.timedelta(seconds=interval), new_counters), (old_time, old_counters)))
+
+    with mock.patch('aclshow.watch', watch_once):
+        test = Aclshow(all=None, clear=None, rules=None, tables='EVERFLOW', verbose=None, watch=10)
+    assert frames[0].startswith("Every 10s, last update: ")
+    assert frames[0].split('\n', 2)[2] == everflow_watch_output
@@ -0,0 +1,56 @@
+import sys
+import os
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from swsssdk import SonicV2Connector
+
+from utilities_common.asic_objects import AsicObjectMaps
+from utilities_common.bulkdb import BulkReader
+
+
+class TestAsicObjectMaps(object):
+    def setup_method(self, method):
+        self.db = SonicV2Connector(host='127.0.0.1')
+        self.db.connect(self.db.ASIC_DB)
+
+    def test_bridge_port_map(self):
+        maps = AsicObjectMaps(self.db)
+        assert maps.get_bridge_port_map() == {
+            "3a000000000616": "1000000000002",
+            "3a000000000618": "1000000000004"
+        }
+        assert maps.get_port_bridge_ports() == {
+            "oid:0x3a000000000616": "oid:0x1000000000002",
+            "oid:0x3a000000000618": "oid:0x1000000000004"
+        }
+        assert maps.get_hostif_names() == {
+            "oid:0x1000000000002": "Ethernet0",
+            "oid:0x1000000000004": "Ethernet4"
+        }
+
+    def test_vlan(self):
+        maps = AsicObjectMaps(self.db)
+        assert maps.get_vlan_id("oid:0x26000000000613") == 1000
+        assert maps.get_vlan_id("oid:0x26000000000999") is None
+        assert maps.get_vlan_oid(1000) == "oid:0x26000000000613"
+        assert maps.get_vlan_oid(2000) is None
+
+    def test_read_once(self):
+        # Each object type is read with one SCAN and one pipelined HMGET
+        reader = BulkReader(self.db)
+        maps = AsicObjectMaps(self.db, reader)
+        maps.get_bridge_port_map()
+        assert reader.calls == 2
+        maps.get_port_bridge_ports()
+        assert reader.calls == 2
+
+        # New objects are seen by new maps
+        self.db.set(self.db.ASIC_DB, "ASIC_STATE:SAI_OBJECT_TYPE_VLAN:oid:0x26000000000614",
+                    "SAI_VLAN_ATTR_VLAN_ID", "2000")
+        assert AsicObjectMaps(self.db).get_vlan_oid(2000) == "oid:0x26000000000614"
@@ -0,0 +1,158 @@
+import sys
+import os
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from swsssdk import ConfigDBConnector
+
+from utilities_common.bulkdb import BatchConfigDB
+
+from imp import load_source
+db_migrator = load_source('db_migrator', os.path.join(scripts_path, 'db_migrator.py'))
+
+
+class RecordingPipeline(object):
+    """
+        Pipeline wrapper recording the name and key of the queued commands
+    """
+    def __init__(self, pipe, commands):
+        self.pipe = pipe
+        self.commands = commands
+
+    def __getattr__(self, name):
+        command = getattr(self.pipe, name)
+
+        def record(*args, **kwargs):
+            if args:
+                self.commands.append((name, args[0]))
+            return command(*args, **kwargs)
+        return record
+
+
+def record_commit_commands(batch_db):
+    commands = []
+    client = batch_db.reader.client(batch_db.db_name)
+    pipeline = client.pipeline
+    client.pipeline = lambda *args, **kwargs: RecordingPipeline(pipeline(*args, **kwargs), commands)
+    try:
+        batch_db.commit()
+    finally:
+        client.pipeline = pipeline
+    return commands
+
+
+class TestBatchConfigDB(object):
+    def setup_method(self, method):
+        self.config_db = ConfigDBConnector()
+        self.config_db.connect()
+
+    def test_snapshot(self):
+        batch_db = BatchConfigDB(self.config_db, ['ACL_TABLE', 'VLAN_SUB_INTERFACE', 'VLAN'])
+        assert batch_db.get_table('ACL_TABLE') == self.config_db.get_table('ACL_TABLE')
+        assert batch_db.get_keys('VLAN_SUB_INTERFACE') == ['Ethernet0.10']
+        assert batch_db.get_table('VLAN') == {}
+        assert batch_db.get_entry('ACL_TABLE', 'DATAACL') == self.config_db.get_entry('ACL_TABLE', 'DATAACL')
+
+        # Returned entries are copies of the snapshot
+        batch_db.get_entry('ACL_TABLE', 'DATAACL')['type'] = 'MIRROR'
+        assert batch_db.get_entry('ACL_TABLE', 'DATAACL')['type'] == 'L3'
+
+    def test_commit(self):
+        batch_db = BatchConfigDB(self.config_db, ['VLAN', 'VLAN_MEMBER', 'VLAN_SUB_INTERFACE'])
+        batch_db.set_entry('VLAN', 'Vlan100', {'vlanid': 100})
+        batch_db.mod_entry('VLAN', 'Vlan100', {'members': ['Ethernet0']})
+        batch_db.set_entry('VLAN_MEMBER', ('Vlan100', 'Ethernet0'), {'tagging_mode': 'untagged'})
+        batch_db.set_entry('VLAN_SUB_INTERFACE', 'Ethernet0.10', None)
+
+        # Changes are only seen in the snapshot until they are committed
+        assert batch_db.get_entry('VLAN', 'Vlan100') == {'vlanid': '100', 'members': ['Ethernet0']}
+        assert batch_db.get_keys('VLAN_MEMBER') == [('Vlan100', 'Ethernet0')]
+        assert batch_db.get_entry('VLAN_MEMBER', 'Vlan100|Ethernet0') == {'tagging_mode': 'untagged'}
+        assert self.config_db.get_entry('VLAN', 'Vlan100') == {}
+
+        calls = batch_db.reader.calls
+        assert batch_db.commit() == 3
+        assert batch_db.reader.calls == calls + 1
+        assert self.config_db.get_entry('VLAN', 'Vlan100') == {'vlanid': '100', 'members': ['Ethernet0']}
+        assert self.config_db.get_entry('VLAN_MEMBER', ('Vlan100', 'Ethernet0')) == {'tagging_mode': 'untagged'}
+        assert self.config_db.get_keys('VLAN_SUB_INTERFACE') == []
+        assert batch_db.commit() == 0
+
+    def test_new_config(self):
+        batch_db = BatchConfigDB(self.config_db, None)
+        batch_db.mod_config({
+            'VLAN': {'Vlan1000': {'vlanid': 1000}},
+            'VLAN_INTERFACE': {'Vlan1000|192.168.0.1/21': {}}
+        })
+        batch_db.mod_config({'VLAN': {'Vlan1000': {'members': ['Ethernet4']}}})
+        batch_db.delete_table('PORT')
+        assert batch_db.get_config() == {
+            'VLAN': {'Vlan1000': {'vlanid': '1000', 'members': ['Ethernet4']}},
+            'VLAN_INTERFACE': {('Vlan1000', '192.168.0.1/21'): {}}
+        }
+
+        # CONFIG_DB is replaced by the new config
+        batch_db.commit(flush=True)
+        assert self.config_db.get_keys('PORT') == []
+        assert self.config_db.get_entry('VLAN', 'Vlan1000') == {'vlanid': '1000', 'members': ['Ethernet4']}
+        assert self.config_db.get_keys('VLAN_INTERFACE') == [('Vlan1000', '192.168.0.1/21')]
+        client = self.config_db.get_redis_client(self.config_db.CONFIG_DB)
+        assert client.get(self.config_db.INIT_INDICATOR) == '1'
+
+    def test_migrate_new_config(self):
+        # As in 'config reload', the new config is migrated before it is written
+        batch_db = BatchConfigDB(self.config_db, None)
+        batch_db.mod_config({
+            'PFC_WD_TABLE': {'Ethernet0': {'action': 'drop'}},
+            'INTERFACE': {'Ethernet0|10.0.0.0/31': {}}
+        })
+        db_migrator.DBMigrator(config_db=batch_db).migrate()
+        assert self.config_db.get_entry('VERSIONS', 'DATABASE') == {}
+
+        batch_db.commit(flush=True)
+        assert self.config_db.get_keys('PFC_WD_TABLE') == []
+        assert self.config_db.get_entry('PFC_WD', 'Ethernet0') == {'action': 'drop'}
+        assert set(self.config_db.get_keys('INTERFACE')) == set(['Ethernet0', ('Ethernet0', '10.0.0.0/31')])
+        assert self.config_db.get_entry('VERSIONS', 'DATABASE') == {'VERSION': 'version_1_0_2'}
+
+    def test_mod_config_delta(self):
+        batch_db = BatchConfigDB(self.config_db, ['ACL_TABLE', 'VLAN'])
+        data_acl = self.config_db.get_entry('ACL_TABLE', 'DATAACL')
+        everflow = self.config_db.get_entry('ACL_TABLE', 'EVERFLOW')
+        everflow['policy_desc'] = 'MIRROR'
+        delta = batch_db.mod_config_delta({
+            'ACL_TABLE': {'DATAACL': data_acl, 'EVERFLOW': everflow},
+            'VLAN': {'Vlan1000': {'vlanid': 1000}}
+        })
+        assert delta == [
+            ('ACL_TABLE', 'EVERFLOW', ['policy_desc']),
+            ('VLAN', 'Vlan1000', None)
+        ]
+        assert list(batch_db.changes) == [('ACL_TABLE', 'EVERFLOW'), ('VLAN', 'Vlan1000')]
+
+        batch_db.commit()
+        assert self.config_db.get_entry('ACL_TABLE', 'EVERFLOW') == everflow
+        assert batch_db.mod_config_delta({'VLAN': {'Vlan1000': {'vlanid': 1000}}}) == []
+
+    def test_commit_in_place(self):
+        self.config_db.set_entry('VLAN', 'Vlan200', {'vlanid': '200', 'members': ['Ethernet0'], 'mtu': '9100'})
+        batch_db = BatchConfigDB(self.config_db, ['VLAN', 'VLAN_SUB_INTERFACE'])
+        batch_db.set_entry('VLAN', 'Vlan200', {'vlanid': '200', 'members': ['Ethernet0', 'Ethernet4']})
+        batch_db.set_entry('VLAN_SUB_INTERFACE', 'Ethernet0.10', None)
+        batch_db.set_entry('VLAN', 'Vlan300', {'vlanid': 300})
+
+        # Only removed entries are deleted, modified ones lose their stale fields
+        commands = record_commit_commands(batch_db)
+        assert ('delete', 'VLAN_SUB_INTERFACE|Ethernet0.10') in commands
+        assert ('hdel', 'VLAN|Vlan200') in commands
+        assert ('delete', 'VLAN|Vlan200') not in commands
+        assert ('delete', 'VLAN|Vlan300') not in commands
+        assert self.config_db.get_entry('VLAN', 'Vlan200') == {'vlanid': '200', 'members': ['Ethernet0', 'Ethernet4']}
+        assert self.config_db.get_entry('VLAN', 'Vlan300') == {'vlanid': '300'}
+        assert self.config_db.get_keys('VLAN_SUB_INTERFACE') == []
@@ -0,0 +1,66 @@
+import sys
+import os
+import mock
+from click.testing import CliRunner
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from swsssdk import ConfigDBConnector
+
+import config.main as config
+
+
+class TestConfigBatch(object):
+    def setup_method(self, method):
+        self.config_db = ConfigDBConnector()
+        self.config_db.connect()
+        self.runner = CliRunner()
+
+    def run_batch(self, commands):
+        # 'config batch' works on the test CONFIG_DB instead of a new one
+        with mock.patch.object(config, 'ConfigDBConnector', return_value=self.config_db), \
+                mock.patch.object(self.config_db, 'connect'):
+            return self.runner.invoke(config.config.commands['batch'], input=commands)
+
+    def test_batch(self):
+        result = self.run_batch("""# new VLAN with members
+vlan add 100
+config vlan member add 100 Ethernet0
+vlan member add -u 100 Ethernet4
+
+portchannel add PortChannel0001
+""")
+        assert result.exit_code == 0
+        assert result.output == "Applied 4 commands, 4 entries changed\n"
+        assert self.config_db.get_entry('VLAN', 'Vlan100') == {'vlanid': '100', 'members': ['Ethernet0', 'Ethernet4']}
+        assert self.config_db.get_entry('VLAN_MEMBER', ('Vlan100', 'Ethernet0')) == {'tagging_mode': 'tagged'}
+        assert self.config_db.get_entry('VLAN_MEMBER', ('Vlan100', 'Ethernet4')) == {'tagging_mode': 'untagged'}
+        assert self.config_db.get_entry('PORTCHANNEL', 'PortChannel0001') == {'admin_status': 'up', 'mtu': '9100'}
+
+    def test_batch_existing_vlan(self):
+        self.config_db.set_entry('VLAN', 'Vlan200', {'vlanid': '200'})
+        client = self.config_db.get_redis_client(self.config_db.CONFIG_DB)
+
+        # Adding members updates the VLAN in place, it is never deleted
+        with mock.patch.object(client, 'delete', wraps=client.delete) as delete:
+            result = self.run_batch("vlan member add 200 Ethernet0\nvlan member add 200 Ethernet4\n")
+        assert result.exit_code == 0
+        assert not delete.called
+        assert self.config_db.get_entry('VLAN', 'Vlan200') == {'vlanid': '200', 'members': ['Ethernet0', 'Ethernet4']}
+
+    def test_batch_failure(self):
+        # Nothing is written when a line fails
+        result = self.run_batch("vlan add 100\nvlan member add 300 Ethernet0\n")
+        assert result.exit_code == 2
+        assert "line 2: Vlan300 doesn't exist" in result.output
+        assert self.config_db.get_entry('VLAN', 'Vlan100') == {}
+
+        result = self.run_batch("vlan add 100\nacl update full acl.json\n")
+        assert result.exit_code == 2
+        assert "line 2: 'acl update full acl.json' can not be batched" in result.output
+        assert self.config_db.get_entry('VLAN', 'Vlan100') == {}
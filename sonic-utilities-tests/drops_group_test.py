@@ -1,5 +1,7 @@
 import sys
 import os
+import json
+import pickle
 import pytest
 import click
 import swsssdk
@@ -67,6 +69,17 @@ Ethernet8      N/A       100          10          0         10
 
 """
 
+expected_counts_json = {
+    "ports": {
+        "Ethernet0": {"STATE": "D", "RX_ERR": 10, "RX_DROPS": 100, "TX_ERR": 0, "TX_DROPS": 0, "DEBUG_2": 20, "DEBUG_0": 80},
+        "Ethernet4": {"STATE": "N/A", "RX_ERR": 0, "RX_DROPS": 1000, "TX_ERR": 0, "TX_DROPS": 0, "DEBUG_2": 100, "DEBUG_0": 800},
+        "Ethernet8": {"STATE": "N/A", "RX_ERR": 100, "RX_DROPS": 10, "TX_ERR": 0, "TX_DROPS": 0, "DEBUG_2": 0, "DEBUG_0": 10}
+    },
+    "switch": {
+        "sonic_drops_test": {"SWITCH_DROPS": 1000}
+    }
+}
+
 expected_counts_with_clear = """    IFACE    STATE    RX_ERR    RX_DROPS    TX_ERR    TX_DROPS    DEBUG_2    DEBUG_0
 ---------  -------  --------  ----------  --------  ----------  ---------  ---------
 Ethernet0        D         0           0         0           0          0          0
@@ -121,6 +134,12 @@ class TestDropCounters(object):
         print(result.output)
         assert result.output == expected_counts_with_type
 
+    def test_show_counts_json(self):
+        runner = CliRunner()
+        result = runner.invoke(show.cli.commands["dropcounters"].commands["counts"], ["-j"])
+        print(result.output)
+        assert json.loads(result.output) == expected_counts_json
+
     def test_show_counts_with_clear(self):
         runner = CliRunner()
         runner.invoke(clear.cli.commands["dropcounters"])
@@ -128,6 +147,23 @@ class TestDropCounters(object):
         print(result.output)
         assert result.output == expected_counts_with_clear
 
+    def test_show_counts_with_legacy_checkpoint(self):
+        # A pickle checkpoint of an older version is ignored and removed
+        dropstat_dir = '/tmp/dropstat'
+        if not os.path.exists(dropstat_dir):
+            os.makedirs(dropstat_dir)
+        stats_files = [os.path.join(dropstat_dir, 'port-stats-{}'.format(os.getuid())),
+                       os.path.join(dropstat_dir, 'switch-stats-{}'.format(os.getuid()))]
+        for stats_file in stats_files:
+            with open(stats_file, 'w') as f:
+                pickle.dump({'Ethernet0': {'SAI_PORT_STAT_IF_IN_ERRORS': 10}}, f)
+
+        runner = CliRunner()
+        result = runner.invoke(show.cli.commands["dropcounters"].commands["counts"], [])
+        print(result.output)
+        assert expected_counts in result.output
+        assert not any(os.path.exists(stats_file) for stats_file in stats_files)
+
     @classmethod
     def teardown_class(cls):
         print("TEARDOWN")
@@ -0,0 +1,107 @@
+import sys
+import os
+import threading
+import mock
+import pytest
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from imp import load_source
+fast_reboot_dump = load_source('fast_reboot_dump', os.path.join(scripts_path, 'fast-reboot-dump.py'))
+
+# 600 neighbors behind Ethernet4 and 10 behind Ethernet8, all in Vlan1000
+ARP_ENTRIES = [('Vlan1000', '00:00:00:00:%02x:%02x' % (i >> 8, i & 0xff), '192.168.%d.%d' % (i >> 8, i & 0xff))
+               for i in range(610)]
+MAP_MAC_IP_PER_VLAN = {'Vlan1000': dict((mac, 'Ethernet4' if i < 600 else 'Ethernet8')
+                                        for i, (_, mac, _) in enumerate(ARP_ENTRIES))}
+
+
+class TestGarpSend(object):
+    def setup_method(self, method):
+        self.sockets = {}
+
+        def new_socket(*args):
+            sock = mock.MagicMock()
+            sock.bind.side_effect = lambda address: self.sockets.setdefault(address[0], sock)
+            return sock
+
+        self.patches = [
+            mock.patch.object(fast_reboot_dump.socket, 'socket', side_effect=new_socket),
+            mock.patch.object(fast_reboot_dump, 'get_iface_ip_addr', return_value='\xc0\xa8\x00\x01'),
+            mock.patch.object(fast_reboot_dump, 'get_iface_mac_addr', return_value='\x00\x01\x02\x03\x04\x05'),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def teardown_method(self, method):
+        for patch in self.patches:
+            patch.stop()
+
+    def sent(self, iface):
+        return self.sockets[iface].send.call_count
+
+    def test_no_deadline(self):
+        assert fast_reboot_dump.garp_send(ARP_ENTRIES, MAP_MAC_IP_PER_VLAN) == 610
+        assert self.sent('Ethernet4') == 600
+        assert self.sent('Ethernet8') == 10
+        packet = self.sockets['Ethernet8'].send.call_args[0][0]
+        assert packet == fast_reboot_dump.make_arp('\x00\x01\x02\x03\x04\x05', '\xc0\xa8\x00\x01',
+                                                   ARP_ENTRIES[-1][1], ARP_ENTRIES[-1][2])
+        assert all(sock.close.called for sock in self.sockets.values())
+
+    def test_deadline(self):
+        # The deadline is checked before each batch of GARP_BATCH_SIZE packets
+        with mock.patch('time.time', side_effect=[100, 101, 102]):
+            sent = fast_reboot_dump.garp_send(ARP_ENTRIES[:600], MAP_MAC_IP_PER_VLAN, deadline=101.5)
+        assert sent == 2 * fast_reboot_dump.GARP_BATCH_SIZE
+        assert self.sent('Ethernet4') == sent
+        assert all(sock.close.called for sock in self.sockets.values())
+
+    def test_deadline_passed(self):
+        with mock.patch('time.time', return_value=200):
+            assert fast_reboot_dump.garp_send(ARP_ENTRIES, MAP_MAC_IP_PER_VLAN, deadline=100) == 0
+        assert self.sent('Ethernet4') == 0
+        assert self.sent('Ethernet8') == 0
+        assert all(sock.close.called for sock in self.sockets.values())
+
+
+class TestPhase(object):
+    def test_timer(self):
+        with mock.patch('time.time', side_effect=[10, 11, 13, 14, 17, 20]):
+            timer = fast_reboot_dump.PhaseTimer()
+            assert timer.timed('fdb', lambda x: x + 1, 1) == 2
+            with pytest.raises(ValueError):
+                timer.timed('neigh', int, 'x')
+            assert timer.report() == ["fdb              started at 1.000s, took 2.000s",
+                                      "neigh            started at 4.000s, took 3.000s",
+                                      "total            10.000s"]
+
+    def test_parallel(self):
+        # Each phase waits for the other one, so they only finish when run
+        # at the same time
+        timer = fast_reboot_dump.PhaseTimer()
+        events = [threading.Event(), threading.Event()]
+
+        def handshake(own, other):
+            events[own].set()
+            return events[other].wait(5)
+
+        phases = [fast_reboot_dump.Phase(timer, 'phase%d' % i, handshake, i, 1 - i) for i in range(2)]
+        for phase in phases:
+            phase.start()
+        assert [phase.wait() for phase in phases] == [True, True]
+        assert sorted(name for name, _, _ in timer.phases) == ['phase0', 'phase1']
+
+    def test_exception(self):
+        timer = fast_reboot_dump.PhaseTimer()
+        phase = fast_reboot_dump.Phase(timer, 'fdb', int, 'x')
+        phase.start()
+        with pytest.raises(ValueError):
+            phase.wait()
+        assert [name for name, _, _ in timer.phases] == ['fdb']
@@ -0,0 +1,43 @@
+import sys
+import os
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from utilities_common.intf_alias import InterfaceAliasConverter
+
+port_dict = {
+    "Ethernet0": {"alias": "etp1"},
+    "Ethernet4": {"alias": "etp2"},
+    "Ethernet8": {"alias": "fortyGigE0/8"},
+    "Ethernet12": {}
+}
+
+
+class TestInterfaceAliasConverter(object):
+    def test_name_to_alias(self):
+        converter = InterfaceAliasConverter(port_dict)
+        assert converter.name_to_alias("Ethernet0") == "etp1"
+        assert converter.name_to_alias("Ethernet4.10") == "etp2.10"
+        assert converter.name_to_alias("PortChannel0001") == "PortChannel0001"
+        assert converter.name_to_alias("Ethernet12") == "Ethernet12"
+        assert converter.name_to_alias(None) is None
+
+    def test_alias_to_name(self):
+        converter = InterfaceAliasConverter(port_dict)
+        assert converter.alias_to_name("etp1") == "Ethernet0"
+        assert converter.alias_to_name("fortyGigE0/8.100") == "Ethernet8.100"
+        assert converter.alias_to_name("PortChannel0001.20") == "PortChannel0001.20"
+
+    def test_alias_max_length(self):
+        converter = InterfaceAliasConverter(port_dict)
+        assert converter.alias_max_length == len("fortyGigE0/8")
+        assert converter.get_alias("Ethernet12") is None
+
+    def test_config_db(self):
+        converter = InterfaceAliasConverter()
+        assert converter.name_to_alias("Ethernet0") == converter.port_dict["Ethernet0"]["alias"]
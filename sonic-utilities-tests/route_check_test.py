@@ -0,0 +1,146 @@
+import sys
+import os
+import json
+import mock
+import redis
+from StringIO import StringIO
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+from imp import load_source
+route_check = load_source('route_check', os.path.join(scripts_path, 'route_check.py'))
+
+ROUTE_KEY = 'ROUTE_TABLE:10.1.0.0/24'
+HOST_ROUTE_KEY = 'ROUTE_TABLE:10.2.0.1'
+INTF_KEY = 'INTF_TABLE:Ethernet8:10.0.0.1/31'
+
+
+def asic_key(prefix):
+    return route_check.ASIC_ROUTE_ENTRY_PREFIX + \
+        '{"dest":"%s","switch_id":"oid:0x21000000000000","vr":"oid:0x3000000000022"}' % prefix
+
+
+class TestRouteCheck(object):
+    def setup_method(self, method):
+        route_check.set_mode('ERR')
+        self.monitor = route_check.RouteMonitor(grace=30)
+        self.appl = self.monitor.appl_db.get_redis_client(self.monitor.appl_db.APPL_DB)
+        self.asic = self.monitor.asic_db.get_redis_client(self.monitor.asic_db.ASIC_DB)
+
+    def report(self, now):
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            self.monitor.report(now)
+        return stdout.getvalue()
+
+    def test_do_diff(self):
+        assert route_check.do_diff(['b', 'a', 'c'], ['c', 'd']) == (['a', 'b'], ['d'])
+        assert route_check.do_diff([], ['a']) == ([], ['a'])
+
+    def test_missing_keyspace_events(self):
+        assert route_check.missing_keyspace_events('') == 'Kgh'
+        assert route_check.missing_keyspace_events('Ex') == 'Kgh'
+        assert route_check.missing_keyspace_events('Kh') == 'g'
+        assert route_check.missing_keyspace_events('AKE') == ''
+
+    def test_enable_keyspace_events(self):
+        events = {'notify-keyspace-events': 'Ex'}
+
+        def config_set(name, value):
+            events[name] = value
+
+        with mock.patch.object(self.appl, 'config_get', create=True, side_effect=lambda name: dict(events)), \
+                mock.patch.object(self.appl, 'config_set', create=True, side_effect=config_set):
+            # Only the missing flags are added, and the old value is restored
+            self.monitor.enable_keyspace_events(self.appl)
+            assert events['notify-keyspace-events'] == 'ExKgh'
+            self.monitor.enable_keyspace_events(self.appl)
+            assert events['notify-keyspace-events'] == 'ExKgh'
+            self.monitor.restore_keyspace_events()
+            assert events['notify-keyspace-events'] == 'Ex'
+
+            # Nothing is changed when the flags are already enabled
+            events['notify-keyspace-events'] = 'AK'
+            self.monitor.enable_keyspace_events(self.appl)
+            self.monitor.restore_keyspace_events()
+            assert events['notify-keyspace-events'] == 'AK'
+
+    def test_update(self):
+        self.appl.hset(ROUTE_KEY, 'nexthop', '10.0.0.1')
+        self.appl.hset(HOST_ROUTE_KEY, 'nexthop', '')
+        self.monitor.update(set(self.monitor.read_appl([ROUTE_KEY, HOST_ROUTE_KEY])), 100)
+        assert self.monitor.pending == {'10.1.0.0/24': {route_check.MISSED_ROUTES: 100}}
+
+        self.asic.hset(asic_key('10.1.0.0/24'), 'SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID', 'oid:0x1')
+        self.asic.hset(asic_key('10.0.0.0/31'), 'SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID', 'oid:0x1')
+        self.monitor.update(set(self.monitor.read_asic([asic_key('10.1.0.0/24'), asic_key('10.0.0.0/31')])), 110)
+        assert self.monitor.pending == {'10.0.0.0/31': {route_check.UNACCOUNTED_ENTRIES: 110}}
+
+        # The interface accounts for its subnet and expects its address
+        self.appl.hset(INTF_KEY, 'NULL', 'NULL')
+        self.monitor.update(set(self.monitor.read_appl([INTF_KEY])), 120)
+        assert self.monitor.pending == {'10.0.0.1/32': {route_check.MISSED_INTF: 120}}
+
+        self.appl.delete(INTF_KEY)
+        self.monitor.update(set(self.monitor.read_appl([INTF_KEY])), 130)
+        assert self.monitor.pending == {'10.0.0.0/31': {route_check.UNACCOUNTED_ENTRIES: 130}}
+
+    def test_report_after_grace(self):
+        self.appl.hset(ROUTE_KEY, 'nexthop', '10.0.0.1')
+        self.monitor.update(set(self.monitor.read_appl([ROUTE_KEY])), 100)
+        assert self.report(120) == ""
+
+        # Reported once when the grace period is over
+        output = self.report(130)
+        assert json.loads(output[len("results: {\n"):-len("\n}\n")]) == {route_check.MISSED_ROUTES: ['10.1.0.0/24']}
+        assert self.report(140) == ""
+
+        self.asic.hset(asic_key('10.1.0.0/24'), 'SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID', 'oid:0x1')
+        self.monitor.update(set(self.monitor.read_asic([asic_key('10.1.0.0/24')])), 150)
+        assert json.loads(self.report(150)) == {"resolved": ['10.1.0.0/24']}
+        assert self.report(200) == ""
+
+    def test_resolved_within_grace(self):
+        self.appl.hset(ROUTE_KEY, 'nexthop', '10.0.0.1')
+        self.monitor.update(set(self.monitor.read_appl([ROUTE_KEY])), 100)
+        self.asic.hset(asic_key('10.1.0.0/24'), 'SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID', 'oid:0x1')
+        self.monitor.update(set(self.monitor.read_asic([asic_key('10.1.0.0/24')])), 110)
+        assert self.monitor.pending == {}
+        assert self.report(200) == ""
+
+    def test_sync(self):
+        self.appl.hset(ROUTE_KEY, 'nexthop', '10.0.0.1')
+        self.monitor.sync()
+        assert self.monitor.routes == set(['10.1.0.0/24'])
+        since = self.monitor.pending['10.1.0.0/24'][route_check.MISSED_ROUTES]
+
+        # Mismatches still present keep the time they were first seen
+        self.appl.hset(HOST_ROUTE_KEY, 'nexthop', '10.0.0.1')
+        self.monitor.sync()
+        assert self.monitor.routes == set(['10.1.0.0/24', '10.2.0.1/32'])
+        assert self.monitor.pending['10.1.0.0/24'] == {route_check.MISSED_ROUTES: since}
+
+        # Keys removed without a notification are dropped
+        self.appl.delete(ROUTE_KEY)
+        self.monitor.sync()
+        assert self.monitor.routes == set(['10.2.0.1/32'])
+        assert list(self.monitor.pending) == ['10.2.0.1/32']
+
+    def test_reconnect(self):
+        # A lost connection is followed by a new subscription and sync
+        with mock.patch.object(self.monitor, 'follow',
+                               side_effect=[redis.exceptions.ConnectionError("Connection reset"), KeyboardInterrupt]) as follow, \
+                mock.patch.object(self.monitor, 'restore_keyspace_events') as restore, \
+                mock.patch('time.sleep'), \
+                mock.patch('sys.stdout', new_callable=StringIO):
+            try:
+                self.monitor.run(1, 300)
+            except KeyboardInterrupt:
+                pass
+        assert follow.call_count == 2
+        assert restore.called
@@ -113,6 +113,52 @@ Ethernet200  Not present
         expected = "Ethernet200: SFP EEPROM Not detected"
         assert result_lines == expected
 
+    def test_sfp_eeprom_json(self):
+        runner = CliRunner()
+        result = runner.invoke(show.cli.commands["interfaces"].commands["transceiver"].commands["eeprom"], ["Ethernet0", "--json"])
+        expected = """{
+    "Ethernet0": {
+        "present": true,
+        "info": {
+            "Connector": "No separable connector",
+            "cable_length": "3",
+            "cable_type": "Length Cable Assembly(m)",
+            "encoding": "64B66B",
+            "ext_identifier": "Power Class 3(2.5W max), CDR present in Rx Tx",
+            "ext_rateselect_compliance": "QSFP+ Rate Select Version 1",
+            "hardwarerev": "AC",
+            "manufacturename": "Mellanox",
+            "modelname": "MFA1A00-C003",
+            "nominal_bit_rate": "255",
+            "serialnum": "MT1706FT02064",
+            "specification_compliance": "{'10/40G Ethernet Compliance Code': '40G Active Cable (XLPPI)'}",
+            "type": "QSFP28 or later",
+            "vendor_date": "2017-01-13 ",
+            "vendor_oui": "00-02-c9"
+        }
+    }
+}
+"""
+        assert result.output == expected
+
+        result = runner.invoke(show.cli.commands["interfaces"].commands["transceiver"].commands["eeprom"], ["Ethernet200", "--json"])
+        expected = """{
+    "Ethernet200": {
+        "present": false
+    }
+}
+"""
+        assert result.output == expected
+
+    def test_sfp_eeprom_csv(self):
+        runner = CliRunner()
+        result = runner.invoke(show.cli.commands["interfaces"].commands["transceiver"].commands["eeprom"], ["--csv"])
+        expected = """port,present,Connector,cable_length,cable_type,encoding,ext_identifier,ext_rateselect_compliance,hardwarerev,manufacturename,modelname,nominal_bit_rate,serialnum,specification_compliance,type,vendor_date,vendor_oui
+Ethernet0,true,No separable connector,3,Length Cable Assembly(m),64B66B,"Power Class 3(2.5W max), CDR present in Rx Tx",QSFP+ Rate Select Version 1,AC,Mellanox,MFA1A00-C003,255,MT1706FT02064,{'10/40G Ethernet Compliance Code': '40G Active Cable (XLPPI)'},QSFP28 or later,2017-01-13 ,00-02-c9
+Ethernet200,false,,,,,,,,,,,,,,,
+"""
+        assert result.output == expected
+
     def teardown_class(cls):
         print("TEARDOWN")
         os.environ["PATH"] = os.pathsep.join(os.environ["PATH"].split(os.pathsep)[:-1])
@@ -0,0 +1,136 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, modules_path)
+
+import sfputil.main as sfputil
+
+
+class MockSfpUtil(object):
+    """
+        Platform sfputil with an EEPROM file per port, ports 1 and 2 on
+        I2C bus 1, port 3 on bus 2 and port 4 without transceiver. Ethernet0
+        is ganged over ports 1 and 2.
+    """
+    qsfp_ports = []
+
+    def __init__(self, eeprom_dir):
+        self.logical = ['Ethernet0', 'Ethernet8', 'Ethernet12']
+        self.port_to_eeprom_mapping = {}
+        self.reads = []
+        self.reading = set()
+        self.lock = threading.Lock()
+        for port, bus in [(1, 1), (2, 1), (3, 2), (4, 2)]:
+            path = os.path.join(eeprom_dir, 'port{0}'.format(port), 'i2c-{0}'.format(bus), '{0}-0050'.format(bus))
+            os.makedirs(path)
+            path = os.path.join(path, 'eeprom')
+            with open(path, 'wb') as f:
+                f.write(bytearray((port + i) % 256 for i in range(256)))
+            self.port_to_eeprom_mapping[port] = path
+
+    def get_logical_to_physical(self, port_name):
+        return {'Ethernet0': [1, 2], 'Ethernet8': [3], 'Ethernet12': [4]}[port_name]
+
+    def is_logical_port(self, port_name):
+        return port_name in self.logical
+
+    def get_presence(self, port):
+        return port != 4
+
+    def get_eeprom_raw(self, port):
+        bus = sfputil.get_port_i2c_bus(port)
+        with self.lock:
+            assert bus not in self.reading
+            self.reading.add(bus)
+            self.reads.append(port)
+        time.sleep(0.01)
+        with open(self.port_to_eeprom_mapping[port], 'rb') as f:
+            eeprom_raw = ['%02x' % byte for byte in bytearray(f.read())]
+        with self.lock:
+            self.reading.remove(bus)
+        return eeprom_raw
+
+    def get_eeprom_dict(self, port):
+        return {'interface': {'data': {'Vendor SN': 'SN{}'.format(port)}},
+                'dom': {'data': {'Temperature': '30.0000C'}}}
+
+
+class TestSfputil(object):
+    def setup_method(self, method):
+        self.tmp_dir = tempfile.mkdtemp()
+        sfputil.platform_sfputil = MockSfpUtil(self.tmp_dir)
+
+    def teardown_method(self, method):
+        sfputil.platform_sfputil = None
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_ports_eeprom(self):
+        port_data = sfputil.read_ports_eeprom([1, 2, 3, 4], True, False)
+        assert port_data[1][:2] == ['01', '02']
+        assert port_data[3][:2] == ['03', '04']
+        assert port_data[4] is None
+
+        # Ports of the same bus are never read at the same time
+        assert sfputil.get_port_i2c_bus(1) == sfputil.get_port_i2c_bus(2) == 1
+        assert sfputil.read_ports_eeprom([1, 2, 3, 4], True, False, jobs=4) == port_data
+
+    def test_ganged_port(self):
+        port_data = sfputil.read_ports_eeprom([1, 2], False, False)
+        output = sfputil.port_eeprom_data_string_pretty('Ethernet0', False, port_data)
+        assert output == ("Ethernet0:1 (ganged): SFP EEPROM detected\n"
+                          "\tVendor SN: SN1\n\n"
+                          "Ethernet0:2 (ganged): SFP EEPROM detected\n"
+                          "\tVendor SN: SN2\n\n")
+
+    def test_cache(self):
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        cache = sfputil.EepromCache(cache_dir)
+        port_data = sfputil.read_ports_eeprom([1, 3], True, False, cache)
+        cache.save()
+        assert oct(os.stat(cache_dir).st_mode & 0o777) == oct(0o700)
+
+        # Cached pages are used as long as the vendor serial is the same
+        platform_sfputil = sfputil.platform_sfputil
+        platform_sfputil.reads = []
+        cache = sfputil.EepromCache(cache_dir)
+        assert sfputil.read_ports_eeprom([1, 3], True, False, cache) == port_data
+        assert platform_sfputil.reads == []
+
+        with open(platform_sfputil.port_to_eeprom_mapping[3], 'r+b') as f:
+            f.seek(sfputil.SFP_VENDOR_SN_OFFSET)
+            f.write(b'X')
+        assert sfputil.read_ports_eeprom([1, 3], True, False, cache)[3][sfputil.SFP_VENDOR_SN_OFFSET] == '58'
+        assert platform_sfputil.reads == [3]
+
+    def test_cache_not_private(self):
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        os.mkdir(cache_dir)
+        os.chmod(cache_dir, 0o777)
+        cache = sfputil.EepromCache(cache_dir)
+        assert not cache.enabled
+        sfputil.read_ports_eeprom([1], True, False, cache)
+        cache.save()
+        assert os.listdir(cache_dir) == []
+
+    def test_decode_without_dom_raw(self):
+        # Without get_eeprom_dom_raw() the whole EEPROM is read for DOM data
+        eeprom_dict = sfputil.decode_eeprom(1, ['00'] * 256, True)
+        assert eeprom_dict == sfputil.platform_sfputil.get_eeprom_dict(1)
+
+    def test_export(self):
+        export_file = os.path.join(self.tmp_dir, 'export.json')
+        port_data = sfputil.read_ports_eeprom([1, 2, 3, 4], True, False)
+        count = sfputil.export_eeprom_raw(['Ethernet0', 'Ethernet8', 'Ethernet12'], port_data, export_file)
+        assert count == 4
+        with open(export_file) as f:
+            export = json.load(f)
+        assert sorted(export) == ['Ethernet0:1 (ganged)', 'Ethernet0:2 (ganged)', 'Ethernet12', 'Ethernet8']
+        assert export['Ethernet8'] == {'present': True, 'eeprom': ''.join(port_data[3])}
+        assert export['Ethernet12'] == {'present': False}
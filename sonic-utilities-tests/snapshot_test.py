@@ -0,0 +1,100 @@
+import sys
+import os
+import datetime
+import pickle
+import shutil
+import tempfile
+from collections import namedtuple, OrderedDict
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+sys.path.insert(0, modules_path)
+
+from utilities_common.snapshot import CounterSnapshot, SnapshotError, load_checkpoint
+
+QStats = namedtuple("QStats", "queueindex, queuetype, totalpacket, droppacket")
+
+
+def make_cnstat(timestamp, rows):
+    cnstat_dict = OrderedDict()
+    cnstat_dict['time'] = timestamp
+    for name, fields in rows:
+        cnstat_dict[name] = QStats._make(fields)
+    return cnstat_dict
+
+
+class TestCounterSnapshot(object):
+    def setup_method(self, method):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_load(self):
+        cnstat_dict = make_cnstat(datetime.datetime(2020, 1, 1, 10, 0, 0, 500000),
+                                  [("Ethernet0:0", ["0", "UC", "100", "N/A"]),
+                                   ("Ethernet0:1", ["1", "MC", "18446744073709551614", "2"])])
+        path = os.path.join(self.tmp_dir, "snapshot")
+        CounterSnapshot.from_cnstat(cnstat_dict).save(path)
+
+        snapshot = CounterSnapshot.load(path)
+        assert snapshot.fields == ["queueindex", "totalpacket", "droppacket"]
+        assert snapshot.time == cnstat_dict['time']
+        assert snapshot.to_cnstat(QStats) == cnstat_dict
+
+    def test_delta_and_rates(self):
+        old = CounterSnapshot.from_cnstat(make_cnstat(datetime.datetime(2020, 1, 1, 10, 0, 0),
+                                                      [("Ethernet0", ["0", "UC", "100", "5"]),
+                                                       ("Ethernet4", ["0", "UC", "N/A", "5"])]))
+        new = CounterSnapshot.from_cnstat(make_cnstat(datetime.datetime(2020, 1, 1, 10, 0, 10),
+                                                      [("Ethernet0", ["0", "UC", "200", "3"]),
+                                                       ("Ethernet4", ["0", "UC", "7", "9"]),
+                                                       ("Ethernet8", ["0", "UC", "1", "1"])]))
+
+        deltas = new.delta(old)
+        assert deltas["Ethernet0"].totalpacket == 100
+        assert deltas["Ethernet0"].droppacket == 0
+        assert deltas["Ethernet4"].totalpacket is None
+        assert deltas["Ethernet8"] is None
+        assert new.delta(old, clamp=False)["Ethernet0"].droppacket == -2
+
+        rates = new.rates(old)
+        assert rates["Ethernet0"].totalpacket == 10.0
+        assert rates["Ethernet4"].droppacket == 0.4
+
+    def test_counts(self):
+        counts = OrderedDict([("Ethernet0", {"SAI_PORT_STAT_IF_IN_ERRORS": 10}),
+                              ("Ethernet4", {"SAI_PORT_STAT_IF_IN_DISCARDS": 1000})])
+        path = os.path.join(self.tmp_dir, "counts")
+        CounterSnapshot.from_counts(counts).save(path)
+        assert CounterSnapshot.load(path).to_counts() == counts
+
+    def test_invalid_file(self):
+        path = os.path.join(self.tmp_dir, "pickle")
+        with open(path, 'w') as f:
+            f.write("(dp0\nS'time'\np1\n")
+        try:
+            CounterSnapshot.load(path)
+            assert False
+        except SnapshotError:
+            pass
+
+    def test_legacy_checkpoint(self):
+        # Checkpoints of older versions were pickled OrderedDicts of namedtuples
+        cnstat_dict = make_cnstat(datetime.datetime(2020, 1, 1), [("Ethernet0:0", ["0", "UC", "100", "1"])])
+        path = os.path.join(self.tmp_dir, "legacy")
+        with open(path, 'w') as f:
+            pickle.dump(dict(cnstat_dict), f)
+
+        assert load_checkpoint(path) is None
+        assert not os.path.exists(path)
+        assert load_checkpoint(path) is None
+
+    def test_truncated_checkpoint(self):
+        path = os.path.join(self.tmp_dir, "truncated")
+        CounterSnapshot.from_counts({"Ethernet0": {"SAI_PORT_STAT_IF_IN_ERRORS": 10}}).save(path)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 4)
+
+        assert load_checkpoint(path) is None
+        assert not os.path.exists(path)
@@ -0,0 +1,92 @@
+import sys
+import os
+import json
+import mock
+from StringIO import StringIO
+from click.testing import CliRunner
+
+test_path = os.path.dirname(os.path.abspath(__file__))
+modules_path = os.path.dirname(test_path)
+scripts_path = os.path.join(modules_path, "scripts")
+sys.path.insert(0, test_path)
+sys.path.insert(0, modules_path)
+
+import mock_tables.dbconnector
+
+import show.main as show
+
+from imp import load_source
+teamshow = load_source('teamshow', os.path.join(scripts_path, 'teamshow'))
+
+# 'teamdctl <team> state dump' output matching the STATE_DB LAG_TABLE and
+# LAG_MEMBER_TABLE of the mock tables
+TEAMDCTL_STATE = {
+    'PortChannel0001': {
+        'setup': {'runner_name': 'lacp'},
+        'runner': {'active': True},
+        'ports': {
+            'Ethernet0': {'runner': {'selected': True}},
+            'Ethernet4': {'runner': {'selected': False}}
+        }
+    },
+    'PortChannel0002': {
+        'setup': {'runner_name': 'lacp'},
+        'runner': {'active': False},
+        'ports': {
+            'Ethernet8': {'runner': {'selected': True}}
+        }
+    }
+}
+
+expected_output = """\
+Flags: A - active, I - inactive, Up - up, Dw - Down, N/A - not available,
+       S - selected, D - deselected, * - not synced
+  No.  Team Dev         Protocol     Ports
+-----  ---------------  -----------  -------------------------
+ 0001  PortChannel0001  LACP(A)(Up)  Ethernet0(S) Ethernet4(D)
+ 0002  PortChannel0002  LACP(I)(Dw)  Ethernet8(S*)
+ 0003  PortChannel0003  N/A
+"""
+
+
+def run_teamdctl(team):
+    if team not in TEAMDCTL_STATE:
+        return 1, '', 'teamdctl: {} not found'.format(team)
+    return 0, json.dumps(TEAMDCTL_STATE[team]), ''
+
+
+class TestTeamshow(object):
+    def summary(self, state_db):
+        team = teamshow.Teamshow()
+        # The port channels are only added here, in the mock CONFIG_DB they
+        # would show up in 'show interfaces status'
+        config_db = team.db.get_redis_client(team.db.CONFIG_DB)
+        for name in ['PortChannel0001', 'PortChannel0002', 'PortChannel0003']:
+            config_db.hset('PORTCHANNEL|' + name, 'admin_status', 'up')
+
+        team.get_portchannel_names()
+        if state_db:
+            team.get_teams_state_db()
+        else:
+            with mock.patch.object(teamshow, 'run_teamdctl', side_effect=run_teamdctl):
+                team.get_teamdctl()
+        team.get_teamshow_result()
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            team.display_summary()
+        return stdout.getvalue()
+
+    def test_teamdctl(self):
+        assert self.summary(False) == expected_output
+
+    def test_state_db(self):
+        assert self.summary(True) == expected_output
+
+    def test_show_portchannel(self):
+        runner = CliRunner()
+        with mock.patch.object(show, 'run_command') as run_command:
+            runner.invoke(show.cli.commands["interfaces"].commands["portchannel"], [])
+            run_command.assert_called_with("sudo teamshow", display_cmd=False)
+
+            # STATE_DB is read without root
+            runner.invoke(show.cli.commands["interfaces"].commands["portchannel"], ["--state-db"])
+            run_command.assert_called_with("teamshow --state-db", display_cmd=False)
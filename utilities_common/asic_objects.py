@@ -0,0 +1,94 @@
+# ASIC object map utility functions #
+
+from utilities_common.bulkdb import BulkReader
+
+ASIC_STATE_PREFIX = 'ASIC_STATE:SAI_OBJECT_TYPE_'
+OID_PREFIX = 'oid:0x'
+
+# Attributes read per object type. They are all create-only in SAI, so the
+# attributes of an object stay valid for as long as its OID exists.
+OBJECT_ATTRS = {
+    'BRIDGE_PORT': ['SAI_BRIDGE_PORT_ATTR_TYPE', 'SAI_BRIDGE_PORT_ATTR_PORT_ID'],
+    'HOSTIF': ['SAI_HOSTIF_ATTR_OBJ_ID', 'SAI_HOSTIF_ATTR_NAME'],
+    'VLAN': ['SAI_VLAN_ATTR_VLAN_ID'],
+}
+
+
+class AsicObjectMaps(object):
+    """
+        OID maps of the ASIC_DB bridge port, host interface and VLAN objects,
+        built once with a SCAN and a pipelined HMGET per object type from
+        a SonicV2Connector connected to ASIC_DB.
+
+        The maps are not kept across runs: OIDs are handed out again from
+        the same counter after ASIC_DB is flushed, so a saved OID could
+        name a different object.
+    """
+    def __init__(self, db, reader=None):
+        self.db = db
+        self.reader = reader if reader is not None else BulkReader(db)
+        self.objects = {}
+        self.vlan_oids = None
+
+    def get_objects(self, obj_type):
+        """
+            Return the objects of a type as a dict of OID to the values of
+            OBJECT_ATTRS[obj_type], None for attributes that are not set.
+        """
+        if obj_type in self.objects:
+            return self.objects[obj_type]
+
+        prefix = ASIC_STATE_PREFIX + obj_type + ':'
+        keys = self.reader.scan_keys(self.db.ASIC_DB, prefix + OID_PREFIX + '*')
+        oids = [key[len(prefix):] for key in keys]
+
+        attrs = self.reader.hmget_bulk(self.db.ASIC_DB, keys, OBJECT_ATTRS[obj_type])
+        objects = dict((oid, attrs[key]) for oid, key in zip(oids, keys))
+        self.objects[obj_type] = objects
+        return objects
+
+    def get_bridge_port_map(self):
+        """
+            Return the bridge port to port OID map, OIDs without 'oid:0x',
+            like swsssdk port_util.get_bridge_port_map()
+        """
+        oid_pfx = len(OID_PREFIX)
+        return dict((oid[oid_pfx:], port_id[oid_pfx:])
+                    for oid, (_, port_id) in self.get_objects('BRIDGE_PORT').items()
+                    if port_id is not None)
+
+    def get_port_bridge_ports(self):
+        """
+            Return the port OID of each bridge port of type port
+        """
+        return dict((oid, port_id)
+                    for oid, (port_type, port_id) in self.get_objects('BRIDGE_PORT').items()
+                    if port_type == 'SAI_BRIDGE_PORT_TYPE_PORT' and port_id is not None)
+
+    def get_hostif_names(self):
+        """
+            Return the host interface name of each port OID
+        """
+        return dict((obj_id, name) for obj_id, name in self.get_objects('HOSTIF').values()
+                    if obj_id is not None and name is not None)
+
+    def get_vlan_id(self, bvid):
+        """
+            Return the VLAN id of a VLAN OID, None if it is not known
+        """
+        value = self.get_objects('VLAN').get(bvid)
+        if value is None or value[0] is None:
+            return None
+        return int(value[0])
+
+    def get_vlan_oid(self, vlan_id):
+        """
+            Return the OID of a VLAN id, None if it is not known
+        """
+        if self.vlan_oids is None:
+            self.vlan_oids = {}
+            for oid in self.get_objects('VLAN'):
+                oid_vlan_id = self.get_vlan_id(oid)
+                if oid_vlan_id is not None:
+                    self.vlan_oids[oid_vlan_id] = oid
+        return self.vlan_oids.get(vlan_id)
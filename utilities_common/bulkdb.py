@@ -0,0 +1,285 @@
+# bulk redis access utility functions #
+
+import copy
+from collections import OrderedDict
+
+BATCH_SIZE = 1000
+SCAN_COUNT = 1000
+
+
+class BulkReader(object):
+    """
+        Pipelined reader on top of a connected swsssdk.SonicV2Connector.
+
+        Every pipeline execution (one batch of up to BATCH_SIZE commands)
+        or plain command issued through the reader counts as a single redis
+        round-trip in 'calls', so tools can report the cost of a fetch.
+    """
+    def __init__(self, db, batch_size=BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.calls = 0
+
+    def client(self, db_name):
+        return self.db.get_redis_client(db_name)
+
+    def pipelined(self, db_name, keys, queue_command):
+        """
+            Run queue_command(pipe, key) for each key in batched pipelines
+            and return the replies in the same order as keys.
+        """
+        keys = list(keys)
+        client = self.client(db_name)
+        replies = []
+        for start in range(0, len(keys), self.batch_size):
+            pipe = client.pipeline(transaction=False)
+            for key in keys[start:start + self.batch_size]:
+                queue_command(pipe, key)
+            replies.extend(pipe.execute())
+            self.calls += 1
+        return replies
+
+    def get(self, db_name, key, field):
+        self.calls += 1
+        return self.client(db_name).hget(key, field)
+
+    def get_all(self, db_name, key):
+        """
+            HGETALL of a single key, None if the key does not exist.
+        """
+        self.calls += 1
+        return self.client(db_name).hgetall(key) or None
+
+    def hmget(self, db_name, key, fields):
+        """
+            HMGET of a single key as a dict of field to value, None for
+            fields that are not present.
+        """
+        fields = list(fields)
+        if not fields:
+            return {}
+        self.calls += 1
+        return dict(zip(fields, self.client(db_name).hmget(key, fields)))
+
+    def keys(self, db_name, pattern):
+        self.calls += 1
+        return self.client(db_name).keys(pattern)
+
+    def scan_batches(self, db_name, pattern, count=SCAN_COUNT):
+        """
+            Iterate the keys matching pattern with a cursor based SCAN, which
+            unlike KEYS does not block redis. Yields the keys of each SCAN
+            reply as a list, skipping keys already returned.
+        """
+        client = self.client(db_name)
+        seen = set()
+        cursor = 0
+        while True:
+            cursor, keys = client.scan(cursor, match=pattern, count=count)
+            self.calls += 1
+            batch = [key for key in keys if key not in seen]
+            seen.update(batch)
+            if batch:
+                yield batch
+            if int(cursor) == 0:
+                break
+
+    def scan_keys(self, db_name, pattern, count=SCAN_COUNT):
+        """
+            Return all the keys matching pattern, see scan_batches().
+        """
+        keys = []
+        for batch in self.scan_batches(db_name, pattern, count):
+            keys.extend(batch)
+        return keys
+
+    def get_all_bulk(self, db_name, keys):
+        """
+            HGETALL of every key in one pipelined batch.
+            Returns a dict of key to field dict, None for missing keys.
+        """
+        keys = list(keys)
+        replies = self.pipelined(db_name, keys, lambda pipe, key: pipe.hgetall(key))
+        return dict((key, reply or None) for key, reply in zip(keys, replies))
+
+    def hmget_bulk(self, db_name, keys, fields):
+        """
+            HMGET of the same fields on every key in one pipelined batch.
+            Returns a dict of key to a list of values ordered as fields,
+            with None for fields that are not present.
+        """
+        keys = list(keys)
+        fields = list(fields)
+        if not fields:
+            return dict((key, []) for key in keys)
+        replies = self.pipelined(db_name, keys, lambda pipe, key: pipe.hmget(key, fields))
+        return dict(zip(keys, replies))
+
+
+class BatchConfigDB(object):
+    """
+        In-memory view of some CONFIG_DB tables for applying many changes
+        at once, on top of a connected swsssdk.ConfigDBConnector.
+
+        The tables are read with one SCAN per table and one pipelined
+        HGETALL. get_entry(), get_keys(), get_table(), set_entry() and
+        mod_entry() behave like the ConfigDBConnector methods, but work on
+        the snapshot and only record the changes; commit() writes them all
+        in one MULTI/EXEC transaction. Changed entries are updated in place,
+        only removed entries are deleted, so subscribers never see a
+        modified entry go away and come back.
+
+        With tables None nothing is read and every table starts empty, to
+        build a whole new configuration with mod_config() and write it with
+        commit(flush=True).
+    """
+    def __init__(self, config_db, tables, reader=None):
+        self.config_db = config_db
+        self.reader = reader if reader is not None else BulkReader(config_db)
+        self.db_name = config_db.CONFIG_DB
+        self.separator = config_db.TABLE_NAME_SEPARATOR
+        self.changes = OrderedDict()
+        self.original = {}
+        self.any_table = tables is None
+        self.tables = {}
+        if tables is None:
+            return
+
+        keys = []
+        for table in tables:
+            self.tables[table] = {}
+            keys.extend(self.reader.scan_keys(self.db_name, table + self.separator + '*'))
+        for key, raw_data in self.reader.get_all_bulk(self.db_name, keys).items():
+            if raw_data is None:
+                continue
+            table, row = key.split(self.separator, 1)
+            self.tables[table][config_db.deserialize_key(row)] = config_db.raw_to_typed(raw_data)
+
+    def table(self, table):
+        if table not in self.tables:
+            if self.any_table:
+                return self.tables.setdefault(table, {})
+            raise KeyError("Table {} is not in the batch snapshot".format(table))
+        return self.tables[table]
+
+    def normalize_key(self, key):
+        """
+            Return key as in the snapshot, a tuple for keys with several
+            parts whether they are given as a tuple or joined with '|'
+        """
+        return self.config_db.deserialize_key(self.config_db.serialize_key(key))
+
+    def get_entry(self, table, key):
+        return copy.deepcopy(self.table(table).get(self.normalize_key(key), {}))
+
+    def get_keys(self, table):
+        return list(self.table(table).keys())
+
+    def get_table(self, table):
+        return copy.deepcopy(self.table(table))
+
+    def set_entry(self, table, key, data):
+        entries = self.table(table)
+        key = self.normalize_key(key)
+        if (table, key) not in self.original:
+            # Raw data in CONFIG_DB, to remove the fields that go away on commit
+            old_entry = entries.get(key)
+            if old_entry is not None:
+                old_entry = self.config_db.typed_to_raw(old_entry) or {'NULL': 'NULL'}
+            self.original[(table, key)] = old_entry
+        if data is None:
+            entries.pop(key, None)
+            self.changes[(table, key)] = None
+        else:
+            # Entries without fields are kept with the NULL placeholder field
+            raw_data = self.config_db.typed_to_raw(data) or {'NULL': 'NULL'}
+            entries[key] = self.config_db.raw_to_typed(raw_data)
+            self.changes[(table, key)] = raw_data
+
+    def mod_entry(self, table, key, data):
+        if data is None:
+            self.set_entry(table, key, None)
+        else:
+            entry = self.get_entry(table, key)
+            entry.update(data)
+            self.set_entry(table, key, entry)
+
+    def delete_table(self, table):
+        for key in self.get_keys(table):
+            self.set_entry(table, key, None)
+
+    def mod_config(self, data):
+        """
+            Merge a whole configuration, as a dict of table to dict of key
+            to entry, field by field like ConfigDBConnector.mod_config()
+        """
+        for table, entries in data.items():
+            if entries is None:
+                self.delete_table(table)
+                continue
+            for key, entry in entries.items():
+                self.mod_entry(table, key, entry)
+
+    def mod_config_delta(self, data):
+        """
+            Merge a whole configuration like mod_config(), but only change
+            the entries that are new or have new or different fields.
+            Returns the delta as a list of (table, key, fields) of the
+            changed entries, with fields None for new entries and the
+            sorted list of new or changed fields otherwise.
+        """
+        delta = []
+        for table in sorted(data):
+            if data[table] is None:
+                continue
+            for key, entry in sorted(data[table].items()):
+                key = self.normalize_key(key)
+                new_entry = self.config_db.raw_to_typed(self.config_db.typed_to_raw(entry) or {})
+                if key not in self.table(table):
+                    delta.append((table, key, None))
+                else:
+                    old_entry = self.table(table)[key]
+                    fields = sorted(field for field, value in new_entry.items() if old_entry.get(field) != value)
+                    if not fields:
+                        continue
+                    delta.append((table, key, fields))
+                self.mod_entry(table, key, new_entry)
+        return delta
+
+    def get_config(self):
+        return dict((table, copy.deepcopy(entries)) for table, entries in self.tables.items() if entries)
+
+    def commit(self, flush=False):
+        """
+            Write the changed entries in one transaction and return how
+            many entries were written or deleted.
+
+            With flush, CONFIG_DB is emptied in the same transaction and
+            marked as initialized once written, like 'config reload' does.
+        """
+        if not self.changes and not flush:
+            return 0
+        pipe = self.reader.client(self.db_name).pipeline(transaction=True)
+        if flush:
+            pipe.flushdb()
+        for (table, key), raw_data in self.changes.items():
+            hash_key = table + self.separator + self.config_db.serialize_key(key)
+            if raw_data is None:
+                if not flush:
+                    pipe.delete(hash_key)
+                continue
+            old_raw_data = self.original.get((table, key)) if not flush else None
+            if old_raw_data:
+                stale_fields = [field for field in old_raw_data if field not in raw_data]
+                if stale_fields:
+                    pipe.hdel(hash_key, *stale_fields)
+            pipe.hmset(hash_key, raw_data)
+        if flush:
+            pipe.set(self.config_db.INIT_INDICATOR, 1)
+        pipe.execute()
+        self.reader.calls += 1
+
+        count = len(self.changes)
+        self.changes.clear()
+        self.original.clear()
+        return count
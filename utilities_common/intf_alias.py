@@ -0,0 +1,103 @@
+# interface alias utility functions #
+
+import os
+
+import click
+from swsssdk import ConfigDBConnector
+
+VLAN_SUB_INTERFACE_SEPARATOR = '.'
+
+
+class InterfaceAliasConverter(object):
+    """Class which handles conversion between interface name and alias
+
+       The PORT table is read once and indexed in both directions, so every
+       lookup is a dictionary access. Sub port interfaces are converted
+       through their parent port; names without an alias (e.g. PortChannels)
+       are returned unchanged.
+    """
+
+    def __init__(self, port_dict=None):
+        if port_dict is None:
+            config_db = ConfigDBConnector()
+            config_db.connect()
+            port_dict = config_db.get_table('PORT')
+
+        if not port_dict:
+            click.echo(message="Warning: failed to retrieve PORT table from ConfigDB!", err=True)
+            port_dict = {}
+
+        self.port_dict = port_dict
+        self.name_to_alias_map = {}
+        self.alias_to_name_map = {}
+        self.alias_max_length = 0
+
+        for port_name, port_entry in port_dict.items():
+            alias = port_entry.get('alias')
+            if alias is None:
+                continue
+            self.name_to_alias_map[port_name] = alias
+            self.alias_to_name_map[alias] = port_name
+            self.alias_max_length = max(self.alias_max_length, len(alias))
+
+    @staticmethod
+    def _convert(interface, index):
+        if interface is None:
+            return None
+
+        sub_intf_sep_idx = interface.find(VLAN_SUB_INTERFACE_SEPARATOR)
+        if sub_intf_sep_idx == -1:
+            return index.get(interface, interface)
+
+        # Convert the parent port and keep the vlan id of the sub port interface
+        parent = interface[:sub_intf_sep_idx]
+        return index.get(parent, parent) + interface[sub_intf_sep_idx:]
+
+    def name_to_alias(self, interface_name):
+        """Return vendor interface alias if SONiC
+           interface name is given as argument
+        """
+        return self._convert(interface_name, self.name_to_alias_map)
+
+    def alias_to_name(self, interface_alias):
+        """Return SONiC interface name if vendor
+           port alias is given as argument
+        """
+        return self._convert(interface_alias, self.alias_to_name_map)
+
+    def get_alias(self, interface_name):
+        """Return the alias of a port, None if it has none
+        """
+        return self.name_to_alias_map.get(interface_name)
+
+    def is_port(self, interface_name):
+        return interface_name in self.port_dict
+
+
+# Per-process instance, see get_alias_converter()
+_alias_converter = None
+
+
+def get_alias_converter():
+    """Return the InterfaceAliasConverter of this process, building it
+       from ConfigDB on first use
+    """
+    global _alias_converter
+    if _alias_converter is None:
+        _alias_converter = InterfaceAliasConverter()
+    return _alias_converter
+
+
+def get_interface_naming_mode():
+    mode = os.getenv('SONIC_CLI_IFACE_MODE')
+    if mode is None:
+        mode = "default"
+    return mode
+
+
+def interface_display_name(interface_name):
+    """Return the interface name to display in the current CLI naming mode
+    """
+    if get_interface_naming_mode() == "alias":
+        return get_alias_converter().name_to_alias(interface_name)
+    return interface_name
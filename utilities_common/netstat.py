@@ -5,52 +5,79 @@ import json
 STATUS_NA = 'N/A'
 PORT_RATE = 40
 
-def ns_diff(newstr, oldstr):
+def format_diff(value):
     """
-        Calculate the diff.
+        Format a counter delta.
     """
-    if newstr == STATUS_NA or oldstr == STATUS_NA:
+    if value is None:
         return STATUS_NA
+    return '{:,}'.format(value)
+
+def format_brate(value, delta):
+    """
+        Format the byte rate of a counter delta.
+    """
+    if value is None:
+        return STATUS_NA
+    rate = value/delta
+    if rate > 1024*1024*10:
+        rate = "{:.2f}".format(rate/1024/1024)+' MB'
+    elif rate > 1024*10:
+        rate = "{:.2f}".format(rate/1024)+' KB'
     else:
-        new, old = int(newstr), int(oldstr)
-        return '{:,}'.format(max(0, new - old))
+        rate = "{:.2f}".format(rate)+' B'
+    return rate+'/s'
+
+def format_prate(value, delta):
+    """
+        Format the packet rate of a counter delta.
+    """
+    if value is None:
+        return STATUS_NA
+    rate = value/delta
+    return "{:.2f}".format(rate)+'/s'
+
+def format_util(value, delta, port_rate=PORT_RATE):
+    """
+        Format the util of a byte counter delta.
+    """
+    if value is None:
+        return STATUS_NA
+    rate = value/delta
+    util = rate/(port_rate*1024*1024*1024/8.0)*100
+    return "{:.2f}%".format(util)
+
+def counter_diff(newstr, oldstr):
+    """
+        Calculate the diff as an integer, None if not available.
+    """
+    if newstr == STATUS_NA or oldstr == STATUS_NA:
+        return None
+    return max(0, int(newstr) - int(oldstr))
+
+def ns_diff(newstr, oldstr):
+    """
+        Calculate the diff.
+    """
+    return format_diff(counter_diff(newstr, oldstr))
 
 def ns_brate(newstr, oldstr, delta):
     """
         Calculate the byte rate.
     """
-    if newstr == STATUS_NA or oldstr == STATUS_NA:
-        return STATUS_NA
-    else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
-        if rate > 1024*1024*10:
-            rate = "{:.2f}".format(rate/1024/1024)+' MB'
-        elif rate > 1024*10:
-            rate = "{:.2f}".format(rate/1024)+' KB'
-        else:
-            rate = "{:.2f}".format(rate)+' B'
-        return rate+'/s'
+    return format_brate(counter_diff(newstr, oldstr), delta)
 
 def ns_prate(newstr, oldstr, delta):
     """
         Calculate the packet rate.
     """
-    if newstr == STATUS_NA or oldstr == STATUS_NA:
-        return STATUS_NA
-    else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
-        return "{:.2f}".format(rate)+'/s'
+    return format_prate(counter_diff(newstr, oldstr), delta)
 
 def ns_util(newstr, oldstr, delta, port_rate=PORT_RATE):
     """
         Calculate the util.
     """
-    if newstr == STATUS_NA or oldstr == STATUS_NA:
-        return STATUS_NA
-    else:
-        rate = int(ns_diff(newstr, oldstr).replace(',',''))/delta
-        util = rate/(port_rate*1024*1024*1024/8.0)*100
-        return "{:.2f}%".format(util)
+    return format_util(counter_diff(newstr, oldstr), delta, port_rate)
 
 def table_as_json(table, header):
     """
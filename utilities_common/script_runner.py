@@ -0,0 +1,52 @@
+# in-process script execution utility functions #
+
+import imp
+import os
+import sys
+from distutils.spawn import find_executable
+
+# Loaded script modules by script name, None for scripts not found
+_scripts = {}
+
+
+def load_script(name):
+    """
+        Import an installed script from PATH as a module.
+        Returns None if the script cannot be found.
+    """
+    if name not in _scripts:
+        module = None
+        path = find_executable(name)
+        if path is not None:
+            # Scripts have no .py suffix; don't leave a compiled copy next to them
+            dont_write_bytecode = sys.dont_write_bytecode
+            sys.dont_write_bytecode = True
+            try:
+                module = imp.load_source(os.path.splitext(name)[0].replace('-', '_'), path)
+            finally:
+                sys.dont_write_bytecode = dont_write_bytecode
+        _scripts[name] = module
+    return _scripts[name]
+
+
+def run_script(name, argv):
+    """
+        Run main(argv) of a script loaded with load_script() and
+        return its exit code.
+    """
+    module = load_script(name)
+    saved_argv = sys.argv
+    sys.argv = [name] + list(argv)
+    try:
+        module.main(list(argv))
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        sys.stderr.write("{}\n".format(e.code))
+        return 1
+    finally:
+        sys.argv = saved_argv
+        sys.stdout.flush()
+    return 0
@@ -0,0 +1,266 @@
+# counter snapshot utility functions #
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+from collections import namedtuple, OrderedDict
+from utilities_common.netstat import STATUS_NA
+
+SNAPSHOT_MAGIC = b'CNST'
+SNAPSHOT_VERSION = 1
+
+# magic, version, reserved, timestamp, number of rows, length of the name table
+SNAPSHOT_HEADER = struct.Struct('<4sHHdII')
+
+# counters are stored as little endian unsigned 64 bit integers
+COUNTER_FORMAT = '<%dQ'
+COUNTER_SIZE = 8
+COUNTER_NA = 0xFFFFFFFFFFFFFFFF
+
+
+class SnapshotError(IOError):
+    pass
+
+
+def is_counter(value):
+    """
+        Check if a value can be stored in a counter column.
+    """
+    if value == STATUS_NA or isinstance(value, (int, long)):
+        return True
+    return isinstance(value, basestring) and value.isdigit()
+
+
+class CounterSnapshot(object):
+    """
+        Counters of a set of named objects (ports, queues, interfaces...)
+        stored as one flat array of integers, one row per object and one
+        column per counter. Columns holding non-numeric values, such as the
+        queue type, are kept aside as per-row labels.
+    """
+    def __init__(self, names, fields, values, timestamp=None, labels=None):
+        self.names = list(names)
+        self.fields = list(fields)
+        self.values = values
+        self.time = timestamp if timestamp is not None else datetime.datetime.now()
+        self.labels = labels if labels is not None else {}
+        self.index = dict((name, pos) for pos, name in enumerate(self.names))
+        self.width = len(self.fields)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_cnstat(cls, cnstat_dict):
+        """
+            Build a snapshot from an OrderedDict of namedtuples, as returned
+            by the get_cnstat() methods of the counter tools.
+        """
+        names = [key for key in cnstat_dict if key != 'time']
+        rows = [cnstat_dict[name] for name in names]
+        tuple_fields = rows[0]._fields if rows else ()
+
+        counter_pos = []
+        labels = {}
+        for pos, field in enumerate(tuple_fields):
+            column = [row[pos] for row in rows]
+            if all(is_counter(value) for value in column):
+                counter_pos.append(pos)
+            else:
+                labels[field] = [str(value) for value in column]
+
+        values = [COUNTER_NA if row[pos] == STATUS_NA else int(row[pos])
+                  for row in rows for pos in counter_pos]
+        return cls(names, [tuple_fields[pos] for pos in counter_pos], values,
+                   cnstat_dict.get('time'), labels)
+
+    @classmethod
+    def from_counts(cls, counts_dict, timestamp=None):
+        """
+            Build a snapshot from a dictionary mapping an object to a
+            dictionary of counter name to integer count.
+        """
+        names = list(counts_dict)
+        fields = sorted(set(field for name in names for field in counts_dict[name]))
+        values = [counts_dict[name].get(field, COUNTER_NA) for name in names for field in fields]
+        return cls(names, fields, values, timestamp)
+
+    def to_cnstat(self, tuple_cls):
+        """
+            Convert the snapshot back to an OrderedDict of tuple_cls.
+        """
+        positions = dict((field, pos) for pos, field in enumerate(self.fields))
+        cnstat_dict = OrderedDict()
+        cnstat_dict['time'] = self.time
+        for row, name in enumerate(self.names):
+            base = row * self.width
+            fields = []
+            for field in tuple_cls._fields:
+                if field in positions:
+                    value = self.values[base + positions[field]]
+                    fields.append(STATUS_NA if value == COUNTER_NA else str(value))
+                elif field in self.labels:
+                    fields.append(self.labels[field][row])
+                else:
+                    fields.append(STATUS_NA)
+            cnstat_dict[name] = tuple_cls._make(fields)
+        return cnstat_dict
+
+    def to_counts(self):
+        """
+            Convert the snapshot back to a dictionary of counter dictionaries.
+        """
+        counts_dict = OrderedDict()
+        for row, name in enumerate(self.names):
+            base = row * self.width
+            counts_dict[name] = dict((field, self.values[base + pos])
+                                     for pos, field in enumerate(self.fields)
+                                     if self.values[base + pos] != COUNTER_NA)
+        return counts_dict
+
+    def row(self, name):
+        """
+            Counters of an object ordered as fields, None for N/A counters.
+        """
+        base = self.index[name] * self.width
+        return [None if value == COUNTER_NA else value
+                for value in self.values[base:base + self.width]]
+
+    def interval(self, old):
+        """
+            Seconds elapsed between an older snapshot and this one.
+        """
+        return (self.time - old.time).total_seconds()
+
+    def delta(self, old, clamp=True):
+        """
+            Compute the counter deltas against an older snapshot in one pass.
+            Returns an OrderedDict mapping each object to a namedtuple of its
+            deltas, or to None if the object is not in the old snapshot.
+            N/A counters give None deltas; with clamp, counters that went
+            backwards give 0.
+        """
+        Delta = namedtuple('Delta', self.fields, rename=True)
+        width = self.width
+        if old.fields == self.fields:
+            old_pos = range(width)
+        else:
+            old_positions = dict((field, pos) for pos, field in enumerate(old.fields))
+            old_pos = [old_positions.get(field) for field in self.fields]
+
+        deltas = OrderedDict()
+        for row, name in enumerate(self.names):
+            old_row = old.index.get(name)
+            if old_row is None:
+                deltas[name] = None
+                continue
+            new_values = self.values[row * width:(row + 1) * width]
+            old_values = [COUNTER_NA if pos is None else old.values[old_row * old.width + pos]
+                          for pos in old_pos]
+            if clamp:
+                deltas[name] = Delta._make(None if new == COUNTER_NA or prev == COUNTER_NA else max(0, new - prev)
+                                           for new, prev in zip(new_values, old_values))
+            else:
+                deltas[name] = Delta._make(None if new == COUNTER_NA or prev == COUNTER_NA else new - prev
+                                           for new, prev in zip(new_values, old_values))
+        return deltas
+
+    def rates(self, old):
+        """
+            Compute the per-second counter rates against an older snapshot.
+            Same layout as delta(), with float rates.
+        """
+        interval = self.interval(old)
+        rates = OrderedDict()
+        for name, delta in self.delta(old).items():
+            if delta is None or interval <= 0:
+                rates[name] = None
+            else:
+                rates[name] = delta._make(None if value is None else value / float(interval)
+                                          for value in delta)
+        return rates
+
+    def save(self, path):
+        """
+            Write the snapshot to a binary file, replacing it atomically.
+        """
+        meta = json.dumps({'names': self.names, 'fields': self.fields, 'labels': self.labels}).encode('utf-8')
+        meta += b' ' * (-len(meta) % COUNTER_SIZE)
+        timestamp = time.mktime(self.time.timetuple()) + self.time.microsecond / 1e6
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, timestamp, len(self.names), len(meta)))
+            f.write(meta)
+            f.write(struct.pack(COUNTER_FORMAT % len(self.values), *self.values))
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+            Memory-map a snapshot file written by save().
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < SNAPSHOT_HEADER.size:
+                raise SnapshotError("Invalid counter snapshot: %s" % path)
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                magic, version, _, timestamp, nrows, meta_len = SNAPSHOT_HEADER.unpack_from(buf, 0)
+                if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                    raise SnapshotError("Invalid counter snapshot: %s" % path)
+                offset = SNAPSHOT_HEADER.size
+                try:
+                    meta = json.loads(buf[offset:offset + meta_len].decode('utf-8'))
+                    count = nrows * len(meta['fields'])
+                except (ValueError, KeyError, TypeError):
+                    raise SnapshotError("Invalid counter snapshot: %s" % path)
+                offset += meta_len
+                if size < offset + count * COUNTER_SIZE:
+                    raise SnapshotError("Truncated counter snapshot: %s" % path)
+                values = struct.unpack_from(COUNTER_FORMAT % count, buf, offset)
+            finally:
+                buf.close()
+
+        return cls(meta['names'], meta['fields'], values,
+                   datetime.datetime.fromtimestamp(timestamp), meta['labels'])
+
+
+def load_checkpoint(path):
+    """
+        Load a counter checkpoint written by CounterSnapshot.save(), None if
+        there is none. A checkpoint that cannot be loaded, such as a pickle
+        file written by an older version, is treated as no checkpoint: it
+        is removed and a notice is printed on stderr.
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        return CounterSnapshot.load(path)
+    except SnapshotError:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        sys.stderr.write("Removed invalid counter checkpoint %s\n" % path)
+    except IOError as e:
+        sys.stderr.write("Cannot read counter checkpoint %s: %s\n" % (path, e.strerror))
+    return None
+
+
+def as_snapshot(cnstat):
+    """
+        Return cnstat as a CounterSnapshot, converting an OrderedDict of
+        namedtuples if needed.
+    """
+    if isinstance(cnstat, CounterSnapshot):
+        return cnstat
+    return CounterSnapshot.from_cnstat(cnstat)
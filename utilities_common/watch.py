@@ -0,0 +1,70 @@
+# counter watch mode utility functions #
+
+import sys
+import time
+
+CURSOR_UP = '\x1b[%dA'
+CLEAR_LINE = '\r\x1b[2K'
+CLEAR_BELOW = '\x1b[J'
+AUTOWRAP_OFF = '\x1b[?7l'
+AUTOWRAP_ON = '\x1b[?7h'
+
+
+class Screen(object):
+    """
+        Redraw a block of text in place on a terminal, rewriting only the
+        lines that changed since the previous frame. Line wrapping is turned
+        off while drawing so that every line takes exactly one row. When the
+        output is not a terminal every frame is printed in full.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.in_place = self.stream.isatty()
+        self.lines = None
+
+    def draw(self, text):
+        lines = text.rstrip('\n').split('\n')
+        out = []
+        if self.lines is None:
+            if self.in_place:
+                out.append(AUTOWRAP_OFF)
+            out.extend(line + '\n' for line in lines)
+        elif not self.in_place:
+            out.append('\n')
+            out.extend(line + '\n' for line in lines)
+        else:
+            out.append(CURSOR_UP % len(self.lines))
+            for pos, line in enumerate(lines):
+                if pos < len(self.lines) and self.lines[pos] == line:
+                    out.append('\n')
+                else:
+                    out.append(CLEAR_LINE + line + '\n')
+            if len(lines) < len(self.lines):
+                out.append(CLEAR_BELOW)
+        self.stream.write(''.join(out))
+        self.stream.flush()
+        self.lines = lines
+
+    def close(self):
+        if self.in_place and self.lines is not None:
+            self.stream.write(AUTOWRAP_ON)
+            self.stream.flush()
+
+
+def watch(interval, fetch, render, stream=None):
+    """
+        Call fetch() every interval seconds and draw render(new, old) for
+        each pair of consecutive results until interrupted.
+    """
+    screen = Screen(stream)
+    old = fetch()
+    try:
+        while True:
+            time.sleep(interval)
+            new = fetch()
+            screen.draw(render(new, old))
+            old = new
+    except KeyboardInterrupt:
+        pass
+    finally:
+        screen.close()